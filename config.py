@@ -4,10 +4,10 @@ Central configuration and flags for the metadata updater.
 """
 
 from pathlib import Path
-import logging
 
 MAIN_DIR = Path(__file__).resolve().parent
 CREDENTIALS_PATH = MAIN_DIR / "credentials.json"
+TOKEN_CACHE_PATH = MAIN_DIR / ".spotify_token.json"   # cached Spotify access token (reused until expiry)
 
 # File iteration / processing
 RECURSIVE = False   # True = also apply to files in subdirectories
@@ -23,19 +23,25 @@ FILENAME_PARSE_MODE = 0
 SPOTIFY_TOKEN_URL =          "https://accounts.spotify.com/api/token"
 SPOTIFY_SEARCH_URL =         "https://api.spotify.com/v1/search"
 SPOTIFY_ARTIST_URL =         "https://api.spotify.com/v1/artists/{}"
+SPOTIFY_ARTISTS_URL =        "https://api.spotify.com/v1/artists"
 SPOTIFY_ARTIST_ALBUMS_URL =  "https://api.spotify.com/v1/artists/{}/albums"
 SPOTIFY_ALBUM_TRACKS_URL =   "https://api.spotify.com/v1/albums/{}/tracks"
 
 # Timeouts and limits
 REQUEST_TIMEOUT = 12
 SPOTIFY_MAX_LIMIT = 50
+MAX_WORKERS = 4                       # files processed concurrently (1 = sequential)
+SPOTIFY_MAX_CONCURRENT_REQUESTS = 4   # cap on in-flight Spotify API requests across workers
 
 # Behavior flags
 OVERWRITE_TITLE_ARTIST_OR_ALBUM = 1   # 0 = preserve title/artist/album, 1 = overwrite
 UPDATE_ONLY_GENRE = 0                 # 1 = only update genre
+WRITE_IN_PLACE = 0                    # 1 = edit FLAC/MP3 tags in place (no temp copy / trash), 0 = always copy
 PRINT_SEARCH_INFO = 0                 # 1 = extended logs
 SEARCH_CANDIDATE_LIMIT = 5            # number of spotify tracks to search per music file
 MARKET = None                         # set e.g. "US" or "ES" to restrict results
 
-# Logging configuration (basic)
-logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+# Persistent Spotify response cache (ISRC/search matches and artist genres)
+CACHE_ENABLED = 1                     # 0 = always query Spotify
+CACHE_PATH = MAIN_DIR / "spotify_cache.sqlite3"
+CACHE_TTL_DAYS = 30                   # entries older than this are refetched
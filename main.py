@@ -6,89 +6,67 @@ If an option is not provided, the default from config.py is used.
 """
 
 import argparse
-import json
-import time
 import logging
-from pathlib import Path
-import sys
 
 # Import config module early so we can mutate it based on CLI args BEFORE importing other modules
 import config
 
-# Ensure config has expected defaults so main can rely on them as baseline values.
-# If a key is missing from config.py, set a sane default here (CLI can still override).
-_DEFAULTS = {
-    "RECURSIVE": False,
-    "PROCESS_TOP_X": 1,
-    "OVERWRITE_TITLE_ARTIST_OR_ALBUM": 0,
-    "UPDATE_ONLY_GENRE": 0,
-    "PRINT_SEARCH_INFO": 0,
-    "SEARCH_CANDIDATE_LIMIT": 5,
-    "MARKET": None,
-}
-for _k, _v in _DEFAULTS.items():
-    if not hasattr(config, _k):
-        setattr(config, _k, _v)
-
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Update audio file metadata using Spotify. CLI overrides config.py defaults."
     )
-    # Boolean flags use default=None so we can detect "not provided" and keep config defaults.
-    parser.add_argument("--recursive", dest="recursive", action="store_true", default=None,
+    # Defaults come straight from config.py; --no-<flag> turns a config-enabled flag off.
+    parser.add_argument("--recursive", dest="recursive", action=argparse.BooleanOptionalAction,
+                        default=bool(config.RECURSIVE),
                         help="--recursive: Process files in subfolders (overrides config.RECURSIVE)")
 
-    parser.add_argument("--process-top-x", dest="process_top_x", type=int, default=None,
+    parser.add_argument("--process-top-x", dest="process_top_x", type=int, default=config.PROCESS_TOP_X,
                         help="--process-top-x int: Number of files to process (overrides config.PROCESS_TOP_X)")
 
-    parser.add_argument("--overwrite-taa", dest="overwrite_title_artist_or_album", action="store_true", default=None,
+    parser.add_argument("--overwrite-taa", dest="overwrite_title_artist_or_album", action=argparse.BooleanOptionalAction,
+                        default=bool(config.OVERWRITE_TITLE_ARTIST_OR_ALBUM),
                         help="--overwrite-taa: Overwrite title/artist/album fields (overrides config.OVERWRITE_TITLE_ARTIST_OR_ALBUM)")
 
-    parser.add_argument("--update-only-genre", dest="update_only_genre", action="store_true", default=None,
+    parser.add_argument("--update-only-genre", dest="update_only_genre", action=argparse.BooleanOptionalAction,
+                        default=bool(config.UPDATE_ONLY_GENRE),
                         help="--update-only-genre: Only update genre fields (overrides config.UPDATE_ONLY_GENRE)")
 
+    parser.add_argument("--write-in-place", dest="write_in_place", action=argparse.BooleanOptionalAction,
+                        default=bool(config.WRITE_IN_PLACE),
+                        help="--write-in-place: Edit FLAC/MP3 tags directly instead of via a temp copy, no trash backup (overrides config.WRITE_IN_PLACE)")
+
     parser.add_argument("--music-path", dest="music_path", type=str, default=None,
                         help="--music-path path: Override music_path from credentials.json with this path")
 
-    # Pass-through extra args to be tolerant
     return parser.parse_args()
 
 
-def apply_cli_overrides_to_config(args):
-    """
-    Mutate config module attributes based on parsed CLI args.
-    """
-    if getattr(args, "recursive", None) is not None:
-        config.RECURSIVE = bool(args.recursive)
-
-    if args.process_top_x is not None:
-        try:
-            config.PROCESS_TOP_X = int(args.process_top_x)
-        except Exception:
-            logging.warning("Invalid process_top_x value passed; keeping config.PROCESS_TOP_X = %r", config.PROCESS_TOP_X)
-
-    if getattr(args, "overwrite_title_artist_or_album", False) is not None:
-        config.OVERWRITE_TITLE_ARTIST_OR_ALBUM = int(bool(args.overwrite_title_artist_or_album))
-
-    if getattr(args, "update_only_genre", False) is not None:
-        config.UPDATE_ONLY_GENRE = int(bool(args.update_only_genre))
-
-    # Note: music_path is handled separately when reading credentials.json
-
-
 def main():
     # Parse CLI args first
     args = parse_args()
 
-    # Apply overrides to config BEFORE importing modules that read them at import-time
-    apply_cli_overrides_to_config(args)
+    # Apply overrides to config BEFORE importing modules that read them at import-time.
+    # music_path is handled separately when reading credentials.json.
+    config.RECURSIVE = args.recursive
+    config.PROCESS_TOP_X = args.process_top_x
+    config.OVERWRITE_TITLE_ARTIST_OR_ALBUM = int(args.overwrite_title_artist_or_album)
+    config.UPDATE_ONLY_GENRE = int(args.update_only_genre)
+    config.WRITE_IN_PLACE = int(args.write_in_place)
+
+    # Deferred so --help and invalid flags exit before these load
+    import heapq
+    import json
+    import time
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+    from operator import itemgetter
+    from pathlib import Path
 
     # Now import modules that depend on config values
     try:
         # Importing these after config overrides ensures modules read the updated config values
-        from modules.processor import process_single_file
-        from modules.core import iter_audio_files, get_creation_time
-        from modules.spotify_client import get_spotify_token
+        from modules.processor import process_single_file, prefetch_isrc_matches, start_wav_pool, shutdown_wav_pool
+        from modules.core import iter_audio_files_with_ctime
+        from modules.spotify_client import get_spotify_token_cached
     except Exception as e:
         logging.error("Failed importing modules after applying CLI overrides: %s", e)
         raise
@@ -118,7 +96,7 @@ def main():
             return
         logging.info("Loaded music path: %s", SOURCE_DIR)
 
-        token, expires_at = get_spotify_token(client_id, client_secret)
+        token, expires_at = get_spotify_token_cached(client_id, client_secret)
         logging.info("Spotify token obtained")
     except FileNotFoundError:
         logging.error("Credentials file not found: %s", config.CREDENTIALS_PATH)
@@ -131,46 +109,80 @@ def main():
         return
 
     # Use possibly overridden PROCESS_TOP_X and RECURSIVE from config
-    paths = [p for p in iter_audio_files(SOURCE_DIR, config.RECURSIVE)]
-    paths.sort(key=lambda p: get_creation_time(p) if p.exists() else 0, reverse=True)
-    total = len(paths)
+    # Creation times are collected during discovery so each file is stat'd once
+    pairs = list(iter_audio_files_with_ctime(SOURCE_DIR, config.RECURSIVE))
+    total = len(pairs)
     logging.info("Found %d audio files (FLAC/MP3/WAV) in %s", total, SOURCE_DIR)
 
+    # Only the newest PROCESS_TOP_X files are kept, so select them in O(N log K)
     if config.PROCESS_TOP_X and isinstance(config.PROCESS_TOP_X, int) and config.PROCESS_TOP_X > 0:
-        limit = min(config.PROCESS_TOP_X, total)
-        paths = paths[:limit]
+        top = heapq.nlargest(config.PROCESS_TOP_X, pairs, key=itemgetter(1))
+    else:
+        top = sorted(pairs, key=itemgetter(1), reverse=True)
+    paths = [p for p, _ in top]
 
     updated = skipped = failed = 0
-    for i, path in enumerate(paths, 1):
-        try:
-            if int(time.time()) >= expires_at:
-                try:
-                    token, expires_at = get_spotify_token(client_id, client_secret)
-                except Exception:
-                    logging.error("Failed to refresh Spotify token")
-                    break
-
-            logging.info("Processing (%d/%d): %s", i, len(paths), path.name)
-            ok = process_single_file(path, token)
+    # Files are independent, so they are processed on a thread pool; Spotify requests
+    # are additionally capped by a semaphore inside modules.spotify_client.
+    max_workers = max(1, int(config.MAX_WORKERS or 1))
+    pending = {}
+
+    def collect(done):
+        nonlocal updated, skipped, failed
+        for fut in done:
+            name = pending.pop(fut)
+            try:
+                ok = fut.result()
+            except Exception as e:
+                logging.error("Unexpected error processing %s: %s", name, e)
+                failed += 1
+                continue
             if ok:
-                logging.info("Updated metadata for: %s (original moved to trash)", path.name)
+                logging.info("Updated metadata for: %s", name)
                 updated += 1
             else:
                 skipped += 1
 
+    # Pass 1: resolve ISRC-tagged files up front, each distinct ISRC searched once
+    # (genre-only runs resolve artists directly and skip this)
+    isrc_matches = None if config.UPDATE_ONLY_GENRE else prefetch_isrc_matches(token, paths, max_workers=max_workers)
+
+    # Several WAV files: rebuild them in worker processes (the rebuild is CPU-bound)
+    n_wav = sum(1 for p in paths if p.suffix.lower() == ".wav")
+    if n_wav > 1:
+        start_wav_pool(min(max_workers, n_wav))
+
+    # Refresh slightly ahead of expiry; compared as floats, no int() per file
+    refresh_at = expires_at - 30
+    n_paths = len(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for i, path in enumerate(paths, 1):
+                name = path.name
+                if time.time() >= refresh_at:
+                    try:
+                        token, expires_at = get_spotify_token_cached(client_id, client_secret)
+                        refresh_at = expires_at - 30
+                    except Exception:
+                        logging.error("Failed to refresh Spotify token")
+                        break
+
+                logging.info("Processing (%d/%d): %s", i, n_paths, name)
+                pending[executor.submit(process_single_file, path, token, isrc_matches)] = name
+                # Keep a bounded window in flight so the token check above stays current
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(as_completed(list(pending)))
         except KeyboardInterrupt:
-            break
-        except Exception as e:
-            logging.error("Unexpected error processing %s: %s", path.name, e)
-            failed += 1
+            for fut in pending:
+                fut.cancel()
+    shutdown_wav_pool()
 
     logging.info("Completed. Updated: %d, Skipped: %d, Failed: %d, Total found: %d", updated, skipped, failed, total)
 
 
 if __name__ == "__main__":
-    # Ensure logging configured
-    try:
-        logging.getLogger().handlers  # just access to avoid lint warnings
-    except Exception:
-        logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    # Logging is configured by the entrypoint only, so importing config has no side effects
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     main()
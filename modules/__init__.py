@@ -1,30 +1,39 @@
 """
 modules.__init__.py
 Package initialization for modules. Export commonly used helpers to simplify imports.
+Submodules are loaded lazily (PEP 562) on first attribute access, so importing the
+package does not pull in mutagen, requests or send2trash until a helper is used.
 """
 
-# Expose the most used modules/functions to simplify imports
-from .filename_utils import infer_artist_title_from_filename, unique_temp_copy, send_original_to_trash
-from .search_utils import (
-    _strip_parentheses_with_feat,
-    _extract_remixer_tokens_from_title,
-    _normalize_text_basic,
-    _normalize_artist_for_search,
-    _normalize_title_for_search,
-    _tokens,
-    _tokens_in_candidate,
-    _build_sanitized_query
-)
-# Expose processor entrypoint and wav utils if available
-try:
-    from .processor import process_single_file
-except Exception:
-    pass
+import importlib
+
+# Map of exported name -> submodule that defines it
+_LAZY = {
+    "infer_artist_title_from_filename": "modules.filename_utils",
+    "unique_temp_copy": "modules.filename_utils",
+    "send_original_to_trash": "modules.filename_utils",
+    "_strip_parentheses_with_feat": "modules.search_utils",
+    "_extract_remixer_tokens_from_title": "modules.search_utils",
+    "_normalize_text_basic": "modules.search_utils",
+    "_normalize_artist_for_search": "modules.search_utils",
+    "_normalize_title_for_search": "modules.search_utils",
+    "_tokens": "modules.search_utils",
+    "_tokens_in_candidate": "modules.search_utils",
+    "_build_sanitized_query": "modules.search_utils",
+    "process_single_file": "modules.processor",
+    "finalize_wav_with_metadata": "modules.wav_utils",
+}
+
+
+def __getattr__(name):
+    target = _LAZY.get(name)
+    if target is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    mod = importlib.import_module(target)
+    val = getattr(mod, name)
+    globals()[name] = val
+    return val
 
-try:
-    from .wav_utils import finalize_wav_with_metadata
-except Exception:
-    pass
 
 # Keep __all__ minimal (optional)
 __all__ = [
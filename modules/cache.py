@@ -0,0 +1,117 @@
+"""
+modules/cache.py
+Persistent on-disk cache (sqlite3) for Spotify responses: ISRC -> track,
+normalized search query -> matched item, and artist id -> genres.
+Entries older than CACHE_TTL_DAYS are ignored. Cache errors are never fatal.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from config import CACHE_ENABLED, CACHE_PATH, CACHE_TTL_DAYS, MARKET, SEARCH_CANDIDATE_LIMIT
+
+_TABLES = ("isrc_to_track", "query_to_match", "artist_to_genres")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_disabled = not CACHE_ENABLED
+# In-process layer so repeated lookups in one run skip sqlite entirely
+_memo: Dict[Tuple[str, str], Any] = {}
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    global _conn, _disabled
+    if _conn is None and not _disabled:
+        try:
+            _conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False)
+            for table in _TABLES:
+                _conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, fetched_at REAL)")
+            _conn.commit()
+        except Exception as e:
+            logging.info("Spotify cache disabled (could not open %s): %s", CACHE_PATH, e)
+            _conn = None
+            _disabled = True
+    return _conn
+
+
+def _get(table: str, key: str) -> Optional[Any]:
+    memo_key = (table, key)
+    with _lock:
+        if memo_key in _memo:
+            return _memo[memo_key]
+        conn = _connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(f"SELECT value, fetched_at FROM {table} WHERE key = ?", (key,)).fetchone()
+        except Exception:
+            return None
+        if not row or time.time() - row[1] > CACHE_TTL_DAYS * 86400:
+            return None
+        try:
+            value = json.loads(row[0])
+        except Exception:
+            return None
+        _memo[memo_key] = value
+        return value
+
+
+def _put(table: str, key: str, value: Any) -> None:
+    with _lock:
+        _memo[(table, key)] = value
+        conn = _connect()
+        if conn is None:
+            return
+        try:
+            conn.execute(f"INSERT OR REPLACE INTO {table} (key, value, fetched_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), time.time()))
+            conn.commit()
+        except Exception as e:
+            logging.info("Could not write Spotify cache entry: %s", e)
+
+
+def query_key(artist: Optional[str], title: Optional[str], album: Optional[str]) -> str:
+    """
+    Stable key for a search input triple. The search settings that change which
+    match is found (MARKET, SEARCH_CANDIDATE_LIMIT) are part of the key, so a
+    config change does not reuse matches found under the old settings.
+    """
+    raw = "\x1f".join((artist or "", title or "", album or "", MARKET or "", str(SEARCH_CANDIDATE_LIMIT)))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_isrc_track(isrc: str) -> Optional[dict]:
+    return _get("isrc_to_track", isrc.strip().upper())
+
+
+def put_isrc_track(isrc: str, track: dict) -> None:
+    _put("isrc_to_track", isrc.strip().upper(), track)
+
+
+def get_query_match(key: str) -> Optional[dict]:
+    return _get("query_to_match", key)
+
+
+def put_query_match(key: str, match: dict) -> None:
+    _put("query_to_match", key, match)
+
+
+def get_artist_genres(artist_id: str) -> Optional[List[str]]:
+    return _get("artist_to_genres", artist_id)
+
+
+def put_artist_genres(artist_id: str, genres: List[str]) -> None:
+    _put("artist_to_genres", artist_id, list(genres))
+
+
+def clear_memo() -> None:
+    """
+    Drop the in-process layer (the on-disk cache is untouched).
+    """
+    with _lock:
+        _memo.clear()
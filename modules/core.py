@@ -2,49 +2,83 @@
 modules/core.py
 Compatibility wrapper. Provides overwrite_metadata_with_spotify and keeps
 file iteration helpers, allowing backwards compatibility with older imports.
+
+Performance note: the hot paths in this tool are I/O-bound (HTTP to Spotify,
+filesystem copies, mutagen tag writes); there is no numeric kernel, so
+SIMD/Numba/Cython/GPU style compilation does not pay off here. Optimization
+effort belongs on lazy imports, fused scandir+stat discovery, and caching of
+tokens/search results.
 """
 
 from pathlib import Path
-import logging
-
-# Delegate to the new processor implementation
-try:
-    from modules.processor import process_single_file
-except Exception:
-    # Fallback if import fails (prevents immediate crash on import)
-    def process_single_file(file_path: Path, token: str):
-        logging.error("modules.processor not available; process_single_file missing.")
-        return False
+import os
+import platform
 
 # Re-export under the old name expected by older code
 def overwrite_metadata_with_spotify(file_path: Path, token: str) -> bool:
     """
     Backwards-compatible wrapper that calls the new processor.process_single_file.
+    The processor is imported on call so importing core for iter_audio_files stays light.
     """
+    from modules.processor import process_single_file
     return process_single_file(file_path, token)
 
 
 # File iteration helpers (kept from the original for compatibility)
+_IS_WINDOWS = platform.system() == "Windows"
+AUDIO_EXTENSIONS = (".flac", ".mp3", ".wav")
+
+
+def _iter_audio_entries(root: Path, recursive: bool):
+    """
+    Yield os.DirEntry objects for audio files under root using a single
+    os.scandir pass per directory (instead of one glob walk per extension).
+    """
+    def walk(d):
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    try:
+                        if e.is_file():
+                            if e.name.lower().endswith(AUDIO_EXTENSIONS):
+                                yield e
+                        elif recursive and e.is_dir(follow_symlinks=False):
+                            yield from walk(e.path)
+                    except OSError:
+                        continue
+        except OSError:
+            return
+
+    yield from walk(root)
+
+
 def iter_audio_files(root: Path, recursive: bool):
-    patterns = ("*.flac", "*.mp3", "*.wav")
-    if recursive:
-        for pat in patterns:
-            yield from root.rglob(pat)
-    else:
-        for pat in patterns:
-            yield from root.glob(pat)
+    for e in _iter_audio_entries(root, recursive):
+        yield Path(e.path)
+
+
+def iter_audio_files_with_ctime(root: Path, recursive: bool):
+    """
+    Yield (path, creation_time) pairs, reusing the DirEntry stat from discovery
+    so each file is stat'd once.
+    """
+    for e in _iter_audio_entries(root, recursive):
+        yield Path(e.path), get_creation_time(e)
 
 
-def get_creation_time(path: Path) -> float:
+def _creation_time_from_stat(s) -> float:
+    if hasattr(s, "st_birthtime"):
+        return float(s.st_birthtime)
+    # Windows uses st_ctime as creation time; otherwise use mtime
+    return float(s.st_ctime if _IS_WINDOWS else s.st_mtime)
+
+
+def get_creation_time(path) -> float:
+    """
+    Creation time of a Path, str or os.DirEntry (DirEntry reuses its cached stat).
+    """
     try:
-        s = path.stat()
-        if hasattr(s, "st_birthtime"):
-            return float(s.st_birthtime)
-        # Windows uses st_ctime as creation time
-        import platform
-        if platform.system() == "Windows":
-            return float(s.st_ctime)
-    # Otherwise use mtime
-        return float(s.st_mtime)
+        s = path.stat() if isinstance(path, os.DirEntry) else os.stat(path)
+        return _creation_time_from_stat(s)
     except Exception:
         return 0.0
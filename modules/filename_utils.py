@@ -4,13 +4,21 @@ Utilities related to file names and temporary operations.
 """
 
 from pathlib import Path
+import os
 import shutil
+import tempfile
 import re
 from typing import Optional, Tuple
-from send2trash import send2trash
+
+import config
 
 # Preserve the original filename-splitting regex and behavior
 _FILENAME_SPLIT_RE = re.compile(r"\s[-–—]\s")
+_split = _FILENAME_SPLIT_RE.split
+_DASH_CHARS = frozenset("-–—")
+
+# send2trash is imported on first use so runs that never replace a file skip loading it
+_send2trash = None
 
 
 def infer_artist_title_from_filename(p: Path) -> Tuple[Optional[str], Optional[str]]:
@@ -25,15 +33,17 @@ def infer_artist_title_from_filename(p: Path) -> Tuple[Optional[str], Optional[s
     stem = p.stem.strip()
     if not stem:
         return None, None
+    # No dash at all: skip the regex split
+    if _DASH_CHARS.isdisjoint(stem):
+        return None, None
 
     # Prefer explicit " space - space " separators
-    m = _FILENAME_SPLIT_RE.split(stem, maxsplit=1)
+    m = _split(stem, maxsplit=1)
     if len(m) == 2:
         left = m[0].strip()
         right = m[1].strip()
-        # FILENAME_PARSE_MODE is provided by config.py
-        from config import FILENAME_PARSE_MODE
-        if FILENAME_PARSE_MODE == 0:
+        # FILENAME_PARSE_MODE is provided by config.py (read through the module so overrides apply)
+        if config.FILENAME_PARSE_MODE == 0:
             artist = left or None
             title = right or None
         else:
@@ -44,20 +54,51 @@ def infer_artist_title_from_filename(p: Path) -> Tuple[Optional[str], Optional[s
     return None, None
 
 
+def _copy_with_stat(src: str, dst: str) -> None:
+    """
+    Copy file data and metadata from src to dst. Where available, try
+    os.copy_file_range first (a reflink on CoW filesystems such as btrfs/xfs,
+    an in-kernel copy elsewhere); fall back to shutil.copy2.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fin, open(dst, "wb") as fout:
+                remaining = os.fstat(fin.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(fin.fileno(), fout.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
 def unique_temp_copy(src: Path) -> Path:
-    base_tmp = src.name + ".tmp"
-    temp_path = src.with_name(base_tmp)
-    i = 0
-    while temp_path.exists():
-        i += 1
-        temp_path = src.with_name(f"{src.name}.tmp{i}")
-    shutil.copy2(str(src), str(temp_path))
-    return temp_path
+    """
+    Copy src to a uniquely named temp file in the same directory. mkstemp creates
+    the file atomically (O_EXCL), so no probing loop is needed.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=src.name + ".", suffix=".tmp", dir=str(src.parent))
+    os.close(fd)
+    try:
+        _copy_with_stat(str(src), tmp)
+    except Exception:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return Path(tmp)
 
 
 def send_original_to_trash(original: Path) -> None:
+    global _send2trash
     try:
-        send2trash(str(original))
+        if _send2trash is None:
+            from send2trash import send2trash
+            _send2trash = send2trash
+        _send2trash(str(original))
     except Exception:
         try:
             original.unlink()
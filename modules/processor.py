@@ -5,54 +5,170 @@ search Spotify (ISRC first, containment fallback) and write metadata for FLAC/MP
 """
 
 from pathlib import Path
+import io
 import logging
-from typing import Optional, Tuple, Dict, Any
-import shutil
+from typing import Optional, Tuple, Dict, Any, Iterable
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # Configuration
-from config import OVERWRITE_TITLE_ARTIST_OR_ALBUM, UPDATE_ONLY_GENRE, PRINT_SEARCH_INFO, MARKET, SEARCH_CANDIDATE_LIMIT
+from config import OVERWRITE_TITLE_ARTIST_OR_ALBUM, UPDATE_ONLY_GENRE, WRITE_IN_PLACE, PRINT_SEARCH_INFO, MARKET, SEARCH_CANDIDATE_LIMIT
 
 # Utilities from other modules
 from modules.filename_utils import infer_artist_title_from_filename, unique_temp_copy, send_original_to_trash
 from modules.search_utils import _strip_parentheses_with_feat, _normalize_artist_for_search, _normalize_title_for_search, _tokens, _tokens_in_candidate, _extract_remixer_tokens_from_title, _normalize_text_basic
-from modules.spotify_client import spotifysearch, spotify_find_best_match, get_spotify_token
+from modules.spotify_client import spotifysearch, spotify_find_best_match, get_spotify_token, spotify_search_isrc, spotify_search_artist_id, resolve_isrc_matches
 from modules.tag_utils import (
     download_image_bytes,
     get_artist_genres,
+    prefetch_artist_genres,
     remove_existing_pictures_generic,
+    has_identical_picture,
     set_genre_on_audio,
 )
 from modules import wav_utils  # wav_utils contains WAV rebuild/insert helpers
+from modules import cache
 
 # Mutagen imports
 from mutagen.flac import FLAC, Picture
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC, TRCK, TPOS, TCON, TSRC, ID3NoHeaderError
+from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC, TRCK, TPOS, TCON, TSRC, TextFrame, ID3NoHeaderError
 from mutagen.wave import WAVE
 
+# Background pool for cover-art downloads that overlap other per-file work (see _io_pool)
+_IO_POOL: Optional[ThreadPoolExecutor] = None
+_IO_POOL_LOCK = threading.Lock()
+
+
+def _io_pool() -> ThreadPoolExecutor:
+    """
+    Return the cover-art pool, creating it on first use so importing this module
+    (e.g. in a WAV worker process) starts no executor.
+    """
+    global _IO_POOL
+    if _IO_POOL is None:
+        with _IO_POOL_LOCK:
+            if _IO_POOL is None:
+                _IO_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cover-art")
+    return _IO_POOL
+
+# Optional process pool for the CPU-bound WAV rebuild (see start_wav_pool)
+_WAV_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def start_wav_pool(max_workers: int) -> None:
+    """
+    Run WAV rebuilds in worker processes so several WAV files can be rebuilt
+    in parallel instead of contending for the GIL. Call shutdown_wav_pool when done.
+    """
+    global _WAV_POOL
+    if _WAV_POOL is None and max_workers > 1:
+        # Workers are spawned rather than forked: the parent already runs HTTP and
+        # cover-art threads, whose held locks a forked child would inherit
+        _WAV_POOL = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_wav_pool() -> None:
+    global _WAV_POOL
+    if _WAV_POOL is not None:
+        _WAV_POOL.shutdown()
+        _WAV_POOL = None
+
+
+def _run_wav_job(fn, *args) -> bool:
+    # Arguments are plain paths/dicts/bytes, so they pickle cheaply to a worker
+    if _WAV_POOL is not None:
+        return _WAV_POOL.submit(fn, *args).result()
+    return fn(*args)
+
+
+def _finalize_wav(temp_path: Path, metadata_map: Dict[str, str], image) -> bool:
+    return _run_wav_job(wav_utils.finalize_wav_with_metadata, temp_path, None, metadata_map, image)
+
 # Basic helpers
 def _val_to_str(v):
-    try:
-        if v is None:
+    if v is None:
+        return None
+    if isinstance(v, (list, tuple)):
+        if not v:
             return None
-        if isinstance(v, (list, tuple)) and v:
-            v0 = v[0]
-            if hasattr(v0, "text"):
-                txt = getattr(v0, "text")
-                if isinstance(txt, (list, tuple)):
+        v = v[0]
+    # Every ID3 text frame (TIT2, TDRC, TRCK, ...) derives from TextFrame
+    if isinstance(v, TextFrame):
+        txt = v.text
+        return str(txt[0]) if isinstance(txt, (list, tuple)) else str(txt)
+    return str(v)
+
+
+# Tag lookup tables for first_tag_generic
+_ID3_FRAME_MAP = {
+    "artist": "TPE1",
+    "albumartist": "TPE2",
+    "album": "TALB",
+    "title": "TIT2",
+    "date": "TDRC",
+    "tracknumber": "TRCK",
+    "discnumber": "TPOS",
+    "isrc": "TSRC",
+    "genre": "TCON",
+}
+_ALT_KEYS = {
+    "title": ("INAM", "NAME", "TITLE", "TIT2"),
+    "artist": ("IART", "AUTH", "ARTIST", "TPE1"),
+    "album": ("IPRD", "ALBUM", "TALB"),
+    "date": ("ICRD", "DATE", "YEAR", "TDRC"),
+    "tracknumber": ("ITRK", "TRACKNUMBER", "TRCK"),
+    "discnumber": ("TPOS", "DISCNUMBER"),
+    "isrc": ("TSRC", "ISRC"),
+    "genre": ("IGEN", "IGNR", "GENR", "GENRE", "TCON"),
+}
+
+
+def _first_tag_flac(tags, key):
+    v = tags.get(key)
+    if v:
+        if isinstance(v, (list, tuple)):
+            return str(v[0])
+        return str(v)
+    return None
+
+
+def _first_tag_id3(tags, key):
+    frame = _ID3_FRAME_MAP.get(key)
+    if frame and frame in tags:
+        f = tags.getall(frame)
+        if f:
+            try:
+                txt = f[0].text
+                if isinstance(txt,(list,tuple)):
                     return str(txt[0])
                 return str(txt)
-            return str(v0)
-        if hasattr(v, "text"):
-            txt = getattr(v, "text")
-            if isinstance(txt, (list, tuple)):
-                return str(txt[0])
-            return str(txt)
-        return str(v)
-    except Exception:
-        try:
-            return str(v)
-        except Exception:
-            return None
+            except Exception:
+                try:
+                    return str(f[0])
+                except Exception:
+                    return None
+    return None
+
+
+def _first_tag_other(tags, key):
+    if getattr(tags, "get", None):
+        v = tags.get(key)
+        if v:
+            return _val_to_str(v)
+        for alt in _ALT_KEYS.get(key, ()):
+            try:
+                vv = tags.get(alt)
+                if vv:
+                    return _val_to_str(vv)
+            except Exception:
+                continue
+    return None
+
+
+# Dispatch on the exact audio object type; subclasses fall back to isinstance checks
+_FIRST_TAG_HANDLERS = {FLAC: _first_tag_flac, ID3: _first_tag_id3, WAVE: _first_tag_other}
 
 
 def first_tag_generic(audio_obj, tags, key):
@@ -60,62 +176,15 @@ def first_tag_generic(audio_obj, tags, key):
     Generic extractor across FLAC/ID3/WAVE.
     """
     try:
-        if isinstance(audio_obj, FLAC):
-            v = tags.get(key)
-            if v:
-                if isinstance(v, (list, tuple)):
-                    return str(v[0])
-                return str(v)
-            return None
-        if isinstance(audio_obj, ID3):
-            map_frames = {
-                "artist": "TPE1",
-                "albumartist": "TPE2",
-                "album": "TALB",
-                "title": "TIT2",
-                "date": "TDRC",
-                "tracknumber": "TRCK",
-                "discnumber": "TPOS",
-                "isrc": "TSRC",
-                "genre": "TCON",
-            }
-            frame = map_frames.get(key)
-            if frame and frame in tags:
-                f = tags.getall(frame)
-                if f:
-                    try:
-                        txt = f[0].text
-                        if isinstance(txt,(list,tuple)):
-                            return str(txt[0])
-                        return str(txt)
-                    except Exception:
-                        try:
-                            return str(f[0])
-                        except Exception:
-                            return None
-            return None
-        if getattr(tags, "get", None):
-            v = tags.get(key)
-            if v:
-                return _val_to_str(v)
-            alt_keys = {
-                "title":["INAM","NAME","TITLE","TIT2"],
-                "artist":["IART","AUTH","ARTIST","TPE1"],
-                "album":["IPRD","ALBUM","TALB"],
-                "date":["ICRD","DATE","YEAR","TDRC"],
-                "tracknumber":["ITRK","TRACKNUMBER","TRCK"],
-                "discnumber":["TPOS","DISCNUMBER"],
-                "isrc":["TSRC","ISRC"],
-                "genre":["IGEN","IGNR","GENR","GENRE","TCON"]
-            }
-            for alt in alt_keys.get(key, []):
-                try:
-                    vv = tags.get(alt)
-                    if vv:
-                        return _val_to_str(vv)
-                except Exception:
-                    continue
-        return None
+        handler = _FIRST_TAG_HANDLERS.get(type(audio_obj))
+        if handler is None:
+            if isinstance(audio_obj, FLAC):
+                handler = _first_tag_flac
+            elif isinstance(audio_obj, ID3):
+                handler = _first_tag_id3
+            else:
+                handler = _first_tag_other
+        return handler(tags, key)
     except Exception:
         return None
 
@@ -168,13 +237,28 @@ def read_audio_object(file_path: Path):
     return audio, tags, ext, wav_has_id3
 
 
-def extract_basic_tags(audio_obj, tags, file_path: Path) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+def read_existing_tags(audio_obj, tags) -> Dict[str, Optional[str]]:
+    """
+    Return the title/artist/album tags as stored in the file (no fallbacks).
+    """
+    return {
+        "title": first_tag_generic(audio_obj, tags, "title"),
+        "artist": first_tag_generic(audio_obj, tags, "artist"),
+        "album": first_tag_generic(audio_obj, tags, "album"),
+    }
+
+
+def extract_basic_tags(audio_obj, tags, file_path: Path,
+                       existing: Optional[Dict[str, Optional[str]]] = None) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
     """
     Return (artist, album, title, isrc) with filename fallback.
+    existing: result of read_existing_tags, if already read.
     """
-    artist = first_tag_generic(audio_obj, tags, "artist") or first_tag_generic(audio_obj, tags, "albumartist")
-    album = first_tag_generic(audio_obj, tags, "album")
-    title = first_tag_generic(audio_obj, tags, "title")
+    if existing is None:
+        existing = read_existing_tags(audio_obj, tags)
+    artist = existing["artist"] or first_tag_generic(audio_obj, tags, "albumartist")
+    album = existing["album"]
+    title = existing["title"]
     isrc_tag = first_tag_generic(audio_obj, tags, "isrc") or first_tag_generic(audio_obj, tags, "ISRC")
 
     ai, ti = infer_artist_title_from_filename(file_path)
@@ -248,22 +332,259 @@ def map_spotify_match_to_metadata(
     return metadata_map, image_url, artist_id, meta_artist
 
 
+def read_isrc_tag(file_path: Path) -> Optional[str]:
+    """
+    Return the ISRC tag of a file (or None) without any filename fallback.
+    """
+    audio_obj, tags, ext, wav_has_id3 = read_audio_object(file_path)
+    if audio_obj is None:
+        return None
+    return first_tag_generic(audio_obj, tags, "isrc") or first_tag_generic(audio_obj, tags, "ISRC")
+
+
+def prefetch_isrc_matches(token: str, paths: Iterable[Path], max_workers: int = 1) -> Dict[str, Optional[dict]]:
+    """
+    First pass of a batch run: read ISRC tags for all paths and resolve the
+    distinct ISRCs once. The result is passed to process_single_file as isrc_matches.
+    Genres of the matched artists are fetched in batches of 50 into the cache.
+    Tags are read on a thread pool, so the pass is not one serial parse per file.
+    """
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="isrc-read") as ex:
+            isrcs = list(ex.map(read_isrc_tag, paths))
+    else:
+        isrcs = [read_isrc_tag(p) for p in paths]
+    matches = resolve_isrc_matches(token, [i for i in isrcs if i], max_workers=max_workers)
+    prefetch_artist_genres(token, (m["artists"][0].get("id") for m in matches.values() if m and m.get("artists")))
+    return matches
+
+
+def _cleanup_temp(temp_path) -> None:
+    """
+    Remove a leftover temp copy; a missing file is fine.
+    """
+    try:
+        Path(temp_path).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _update_genre_only(file_path: Path, token: str, audio_obj, tags, ext: str,
+                       artist: Optional[str], album: Optional[str], title: Optional[str],
+                       isrc_tag: Optional[str], isrc_matches: Optional[Dict[str, Optional[dict]]]) -> bool:
+    """
+    UPDATE_ONLY_GENRE path: resolve an artist id as cheaply as possible
+    (prefetched/cached ISRC match, else a limit=1 artist search), fetch its
+    genres and rewrite only the genre tag. FLAC is edited in place.
+    """
+    artist_id = None
+    if isrc_tag:
+        isrc_key = isrc_tag.strip()
+        match = isrc_matches.get(isrc_key) if isrc_matches else None
+        match = match or cache.get_isrc_track(isrc_key)
+        if match and match.get("artists"):
+            artist_id = match["artists"][0].get("id")
+    if not artist_id and artist:
+        artist_id = spotify_search_artist_id(token, _strip_parentheses_with_feat(artist))
+    if not artist_id and title:
+        match = spotify_find_best_match(token, None, None, _strip_parentheses_with_feat(title), combined_limit=SEARCH_CANDIDATE_LIMIT)
+        if match and match.get("artists"):
+            artist_id = match["artists"][0].get("id")
+    if not artist_id:
+        logging.info("No Spotify artist for: %s", file_path.name)
+        return False
+
+    genres = get_artist_genres(token, artist_id)
+    if not genres:
+        logging.info("No genres found for: %s", file_path.name)
+        return False
+
+    # FLAC: mutagen rewrites only the metadata blocks, so no temp copy is needed
+    if ext == ".flac":
+        try:
+            audio = FLAC(str(file_path))
+            set_genre_on_audio(file_path, audio, genres)
+            audio.save()
+            return True
+        except Exception as e:
+            logging.error("Failed updating genre for %s: %s", file_path.name, e)
+            return False
+
+    temp_path = unique_temp_copy(file_path)
+    try:
+        if ext == ".mp3":
+            try:
+                audio_tmp = ID3(str(temp_path))
+            except ID3NoHeaderError:
+                audio_tmp = ID3()
+            set_genre_on_audio(file_path, audio_tmp, genres)
+            audio_tmp.save(str(temp_path))
+        elif ext == ".wav":
+            # Carry the existing ID3 frames (cover art included) over with only TCON replaced;
+            # a tag mutagen found before the RIFF header is moved into the 'id3 ' chunk
+            id3 = ID3()
+            if isinstance(tags, ID3):
+                for frame in tags.values():
+                    id3.add(frame)
+            set_genre_on_audio(file_path, id3, genres)
+            bio = io.BytesIO()
+            id3.save(bio, v2_version=3)
+            id3_bytes = bio.getvalue()
+            if len(id3_bytes) % 2 == 1:
+                id3_bytes += b"\x00"
+            if not _run_wav_job(wav_utils.update_wav_genre, temp_path, "; ".join(genres), id3_bytes):
+                _cleanup_temp(temp_path)
+                return False
+        else:
+            _cleanup_temp(temp_path)
+            return False
+        send_original_to_trash(file_path)
+        os.replace(temp_path, file_path)
+        return True
+    except Exception as e:
+        _cleanup_temp(temp_path)
+        logging.error("Failed updating genre for %s: %s", file_path.name, e)
+        return False
+
+
+def _apply_flac_tags(file_path: Path, audio_tmp, metadata_map: Dict[str, str], got_image,
+                     existing: Dict[str, Optional[str]]) -> None:
+    """
+    Write metadata_map (and cover art, if any) onto an opened FLAC object.
+    existing holds the original file's title/artist/album, kept when not overwriting.
+    """
+    if audio_tmp.tags is None:
+        audio_tmp.tags = {}
+    if OVERWRITE_TITLE_ARTIST_OR_ALBUM:
+        audio_tmp.tags["title"] = [metadata_map["title"]]
+        audio_tmp.tags["artist"] = [metadata_map["artist"]]
+        if metadata_map["album"]:
+            audio_tmp.tags["album"] = [metadata_map["album"]]
+    else:
+        # set only if missing (keeps previous)
+        if not existing["title"] and metadata_map["title"]:
+            audio_tmp.tags["title"] = [metadata_map["title"]]
+        if not existing["artist"] and metadata_map["artist"]:
+            audio_tmp.tags["artist"] = [metadata_map["artist"]]
+        if metadata_map["album"] and not existing["album"]:
+            audio_tmp.tags["album"] = [metadata_map["album"]]
+
+    if metadata_map["date"]:
+        audio_tmp.tags["date"] = [metadata_map["date"]]
+    if metadata_map["track"]:
+        audio_tmp.tags["tracknumber"] = [metadata_map["track"]]
+    if metadata_map["disc"]:
+        audio_tmp.tags["discnumber"] = [metadata_map["disc"]]
+    if metadata_map["genre"]:
+        set_genre_on_audio(file_path, audio_tmp, metadata_map["genre"].split("; ") if metadata_map["genre"] else [])
+    # Re-adding an identical cover would only shift the FLAC metadata blocks
+    if got_image and not has_identical_picture(audio_tmp, *got_image):
+        image_bytes, mime = got_image
+        pic = Picture()
+        pic.data = image_bytes
+        pic.type = 3
+        pic.mime = mime
+        try:
+            remove_existing_pictures_generic(file_path, audio_tmp)
+        except Exception:
+            pass
+        try:
+            audio_tmp.add_picture(pic)
+        except Exception:
+            pass
+
+
+def _apply_mp3_tags(file_path: Path, audio_tmp, metadata_map: Dict[str, str], got_image,
+                    existing: Dict[str, Optional[str]]) -> None:
+    """
+    Write metadata_map (and cover art, if any) onto an opened ID3 object.
+    existing holds the original file's title/artist/album, kept when not overwriting.
+    """
+    if OVERWRITE_TITLE_ARTIST_OR_ALBUM:
+        audio_tmp.delall("TIT2"); audio_tmp.add(TIT2(encoding=3, text=metadata_map["title"]))
+        audio_tmp.delall("TPE1"); audio_tmp.add(TPE1(encoding=3, text=metadata_map["artist"]))
+        if metadata_map["album"]:
+            audio_tmp.delall("TALB"); audio_tmp.add(TALB(encoding=3, text=metadata_map["album"]))
+    else:
+        if not existing["title"] and metadata_map["title"]:
+            audio_tmp.delall("TIT2"); audio_tmp.add(TIT2(encoding=3, text=metadata_map["title"]))
+        if not existing["artist"] and metadata_map["artist"]:
+            audio_tmp.delall("TPE1"); audio_tmp.add(TPE1(encoding=3, text=metadata_map["artist"]))
+        if metadata_map["album"] and not existing["album"]:
+            audio_tmp.delall("TALB"); audio_tmp.add(TALB(encoding=3, text=metadata_map["album"]))
+    if metadata_map["date"]:
+        audio_tmp.delall("TDRC"); audio_tmp.add(TDRC(encoding=3, text=metadata_map["date"]))
+    if metadata_map["track"]:
+        audio_tmp.delall("TRCK"); audio_tmp.add(TRCK(encoding=3, text=metadata_map["track"]))
+    if metadata_map["disc"]:
+        audio_tmp.delall("TPOS"); audio_tmp.add(TPOS(encoding=3, text=metadata_map["disc"]))
+    if metadata_map["genre"]:
+        audio_tmp.delall("TCON"); audio_tmp.add(TCON(encoding=3, text=metadata_map["genre"]))
+    if metadata_map["isrc"]:
+        try:
+            audio_tmp.delall("TSRC"); audio_tmp.add(TSRC(encoding=3, text=metadata_map["isrc"]))
+        except Exception:
+            pass
+    if got_image and not has_identical_picture(audio_tmp, *got_image):
+        image_bytes, mime = got_image
+        try:
+            remove_existing_pictures_generic(file_path, audio_tmp)
+        except Exception:
+            pass
+        try:
+            audio_tmp.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=image_bytes))
+        except Exception:
+            pass
+
+
+def _write_in_place(file_path: Path, metadata_map: Dict[str, str], got_image, ext: str,
+                    existing: Dict[str, Optional[str]]) -> bool:
+    """
+    Update FLAC/MP3 tags directly on file_path. mutagen only rewrites the tag
+    region when the existing padding suffices, so no full-file copy is made.
+    Returns False on failure so the caller can fall back to the temp-copy path.
+    """
+    try:
+        if ext == ".flac":
+            audio = FLAC(str(file_path))
+            _apply_flac_tags(file_path, audio, metadata_map, got_image, existing)
+            audio.save()
+            return True
+        if ext == ".mp3":
+            try:
+                audio = ID3(str(file_path))
+            except ID3NoHeaderError:
+                audio = ID3()
+            _apply_mp3_tags(file_path, audio, metadata_map, got_image, existing)
+            audio.save(str(file_path))
+            return True
+    except Exception as e:
+        logging.info("In-place write failed for %s, using temp copy: %s", file_path.name, e)
+    return False
+
+
 # Main processing function
-def process_single_file(file_path: Path, token: str) -> bool:
+def process_single_file(file_path: Path, token: str, isrc_matches: Optional[Dict[str, Optional[dict]]] = None) -> bool:
     """
     Process one file: read tags, search Spotify (ISRC first), obtain metadata_map,
     and write tags / pictures. WAV handling delegated to wav_utils.
+    isrc_matches is an optional {isrc: track or None} table from prefetch_isrc_matches;
+    ISRCs found there are not searched again.
     Returns True if updated, False otherwise.
     """
     audio_obj, tags, ext, wav_has_id3 = read_audio_object(file_path)
     if audio_obj is None and ext not in (".flac", ".mp3", ".wav"):
         return False
 
-    artist, album, title, isrc_tag = extract_basic_tags(audio_obj, tags, file_path)
+    existing = read_existing_tags(audio_obj, tags)
+    artist, album, title, isrc_tag = extract_basic_tags(audio_obj, tags, file_path, existing)
     if not artist and not title:
         logging.info("Insufficient metadata for: %s", file_path.name)
         return False
 
+    if UPDATE_ONLY_GENRE:
+        return _update_genre_only(file_path, token, audio_obj, tags, ext, artist, album, title, isrc_tag, isrc_matches)
+
     artist_for_search = _strip_parentheses_with_feat(artist) if artist else None
     title_for_search = _strip_parentheses_with_feat(title) if title else None
     album_for_search = _strip_parentheses_with_feat(album) if album else None
@@ -271,20 +592,20 @@ def process_single_file(file_path: Path, token: str) -> bool:
     # Try ISRC first
     match = None
     if isrc_tag:
-        isrc_q = f'isrc:"{isrc_tag.strip()}"'
-        if PRINT_SEARCH_INFO:
-            logging.info("Attempting ISRC search: %s", isrc_q)
-        try:
-            j = spotifysearch(token, isrc_q, type_="track", limit=1, offset=0, market=MARKET)
-            if j:
-                items = j.get("tracks", {}).get("items", [])
-                if items:
-                    match = items[0]
-        except Exception:
-            match = None
+        isrc_key = isrc_tag.strip()
+        if isrc_matches is not None and isrc_key in isrc_matches:
+            match = isrc_matches[isrc_key]
+        else:
+            # Rate-limit errors propagate instead of being treated as "no match"
+            match = spotify_search_isrc(token, isrc_key)
 
     if not match:
-        match = spotify_find_best_match(token, artist_for_search, album_for_search, title_for_search, combined_limit=SEARCH_CANDIDATE_LIMIT)
+        q_key = cache.query_key(artist_for_search, title_for_search, album_for_search)
+        match = cache.get_query_match(q_key)
+        if not match:
+            match = spotify_find_best_match(token, artist_for_search, album_for_search, title_for_search, combined_limit=SEARCH_CANDIDATE_LIMIT)
+            if match:
+                cache.put_query_match(q_key, match)
 
     if not match:
         logging.info("No Spotify match for: %s", file_path.name)
@@ -292,68 +613,37 @@ def process_single_file(file_path: Path, token: str) -> bool:
 
     metadata_map, image_url, artist_id, meta_artist = map_spotify_match_to_metadata(match, artist, album, title, isrc_tag)
 
-    # Optionally fetch genres via artist id (if not already present)
+    # Genres and cover art only depend on the match: download the image in the
+    # background while genres are fetched and the temp copy is made.
+    image_future = _io_pool().submit(download_image_bytes, image_url) if image_url else None
+
+    # Optionally fetch genres via artist id (if not already present); a rate-limited
+    # lookup raises instead of letting the file be written without its genre
     if artist_id:
-        try:
-            g = get_artist_genres(token, artist_id)
-            if g:
-                metadata_map["genre"] = "; ".join(g)
-        except Exception:
-            pass
+        g = get_artist_genres(token, artist_id)
+        if g:
+            metadata_map["genre"] = "; ".join(g)
+
+    # FLAC/MP3 tags can be updated without copying the whole file
+    got_image = None
+    if WRITE_IN_PLACE and ext in (".flac", ".mp3"):
+        got_image = image_future.result() if image_future else None
+        image_future = None
+        if _write_in_place(file_path, metadata_map, got_image, ext, existing):
+            return True
 
     # Create temp copy
-    temp_path = unique_temp_copy(file_path)
+    try:
+        temp_path = unique_temp_copy(file_path)
+    finally:
+        if image_future:
+            got_image = image_future.result()
     try:
         # FLAC write
         if ext == ".flac":
             audio_tmp = FLAC(str(temp_path))
-            if audio_tmp.tags is None:
-                audio_tmp.tags = {}
-            if OVERWRITE_TITLE_ARTIST_OR_ALBUM:
-                audio_tmp.tags["title"] = [metadata_map["title"]]
-                audio_tmp.tags["artist"] = [metadata_map["artist"]]
-                if metadata_map["album"]:
-                    audio_tmp.tags["album"] = [metadata_map["album"]]
-            else:
-                # set only if missing (keeps previous)
-                if not first_tag_generic(audio_tmp, audio_tmp.tags, "title") and metadata_map["title"]:
-                    audio_tmp.tags["title"] = [metadata_map["title"]]
-                if not first_tag_generic(audio_tmp, audio_tmp.tags, "artist") and metadata_map["artist"]:
-                    audio_tmp.tags["artist"] = [metadata_map["artist"]]
-                if metadata_map["album"] and not first_tag_generic(audio_tmp, audio_tmp.tags, "album"):
-                    audio_tmp.tags["album"] = [metadata_map["album"]]
-
-            if metadata_map["date"]:
-                audio_tmp.tags["date"] = [metadata_map["date"]]
-            if metadata_map["track"]:
-                audio_tmp.tags["tracknumber"] = [metadata_map["track"]]
-            if metadata_map["disc"]:
-                audio_tmp.tags["discnumber"] = [metadata_map["disc"]]
-            if metadata_map["genre"]:
-                set_genre_on_audio(file_path, audio_tmp, metadata_map["genre"].split("; ") if metadata_map["genre"] else [])
-            if image_url:
-                got = download_image_bytes(image_url)
-                if got:
-                    image_bytes, mime = got
-                    pic = Picture()
-                    pic.data = image_bytes
-                    pic.type = 3
-                    pic.mime = mime
-                    try:
-                        remove_existing_pictures_generic(file_path, audio_tmp)
-                    except Exception:
-                        pass
-                    try:
-                        audio_tmp.add_picture(pic)
-                    except Exception:
-                        pass
-            try:
-                audio_tmp.save()
-            except Exception:
-                try:
-                    audio_tmp.save(str(temp_path))
-                except Exception:
-                    pass
+            _apply_flac_tags(file_path, audio_tmp, metadata_map, got_image, existing)
+            audio_tmp.save()
 
         # MP3 write
         elif ext == ".mp3":
@@ -361,81 +651,27 @@ def process_single_file(file_path: Path, token: str) -> bool:
                 audio_tmp = ID3(str(temp_path))
             except ID3NoHeaderError:
                 audio_tmp = ID3()
-            if OVERWRITE_TITLE_ARTIST_OR_ALBUM:
-                audio_tmp.delall("TIT2"); audio_tmp.add(TIT2(encoding=3, text=metadata_map["title"]))
-                audio_tmp.delall("TPE1"); audio_tmp.add(TPE1(encoding=3, text=metadata_map["artist"]))
-                if metadata_map["album"]:
-                    audio_tmp.delall("TALB"); audio_tmp.add(TALB(encoding=3, text=metadata_map["album"]))
-            else:
-                if not first_tag_generic(audio_tmp, audio_tmp, "title") and metadata_map["title"]:
-                    audio_tmp.delall("TIT2"); audio_tmp.add(TIT2(encoding=3, text=metadata_map["title"]))
-                if not first_tag_generic(audio_tmp, audio_tmp, "artist") and metadata_map["artist"]:
-                    audio_tmp.delall("TPE1"); audio_tmp.add(TPE1(encoding=3, text=metadata_map["artist"]))
-                if metadata_map["album"] and not first_tag_generic(audio_tmp, audio_tmp, "album"):
-                    audio_tmp.delall("TALB"); audio_tmp.add(TALB(encoding=3, text=metadata_map["album"]))
-            if metadata_map["date"]:
-                audio_tmp.delall("TDRC"); audio_tmp.add(TDRC(encoding=3, text=metadata_map["date"]))
-            if metadata_map["track"]:
-                audio_tmp.delall("TRCK"); audio_tmp.add(TRCK(encoding=3, text=metadata_map["track"]))
-            if metadata_map["disc"]:
-                audio_tmp.delall("TPOS"); audio_tmp.add(TPOS(encoding=3, text=metadata_map["disc"]))
-            if metadata_map["genre"]:
-                audio_tmp.delall("TCON"); audio_tmp.add(TCON(encoding=3, text=metadata_map["genre"]))
-            if metadata_map["isrc"]:
-                try:
-                    audio_tmp.delall("TSRC"); audio_tmp.add(TSRC(encoding=3, text=metadata_map["isrc"]))
-                except Exception:
-                    pass
-            if image_url:
-                got = download_image_bytes(image_url)
-                if got:
-                    image_bytes, mime = got
-                    try:
-                        remove_existing_pictures_generic(file_path, audio_tmp)
-                    except Exception:
-                        pass
-                    try:
-                        audio_tmp.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=image_bytes))
-                    except Exception:
-                        pass
-            try:
-                audio_tmp.save(str(temp_path))
-            except Exception:
-                try:
-                    audio_tmp.save()
-                except Exception:
-                    pass
+            _apply_mp3_tags(file_path, audio_tmp, metadata_map, got_image, existing)
+            audio_tmp.save(str(temp_path))
 
         # WAV: delegate to wav_utils to handle rebuild and chunk insertion
         elif ext == ".wav":
-            updated = wav_utils.finalize_wav_with_metadata(temp_path, image_url, metadata_map)
+            updated = _finalize_wav(temp_path, metadata_map, got_image)
             if not updated:
-                # clean up temp if wav_utils failed
-                try:
-                    Path(temp_path).unlink(missing_ok=True)
-                except Exception:
-                    pass
+                _cleanup_temp(temp_path)
                 return False
 
         else:
             logging.info("Unsupported for write: %s", file_path.name)
-            if Path(temp_path).exists():
-                try:
-                    Path(temp_path).unlink()
-                except Exception:
-                    pass
+            _cleanup_temp(temp_path)
             return False
 
         # Replace original: send original to trash and move temp into place
         send_original_to_trash(file_path)
-        shutil.move(str(temp_path), str(file_path))
+        os.replace(temp_path, file_path)
         return True
 
     except Exception as e:
-        if Path(temp_path).exists():
-            try:
-                Path(temp_path).unlink()
-            except Exception:
-                pass
+        _cleanup_temp(temp_path)
         logging.error("Failed updating %s: %s", file_path.name, e)
         return False
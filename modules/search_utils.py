@@ -3,26 +3,48 @@ modules/search_utils.py
 Text normalization utilities, remix token extraction, and query construction.
 """
 
-from typing import Optional, List
+from functools import lru_cache
+from typing import Iterable, Optional, List
 import re
 import unicodedata
 
+# Precompiled patterns shared by the normalization helpers
+_RE_PAREN = re.compile(r"\(([^)]*)\)")
+_RE_BRACK = re.compile(r"\[([^]]*)\]")
+_RE_FEAT = re.compile(r"\b(feat\.?|ft\.?)\b", re.IGNORECASE)
+_RE_WS = re.compile(r"\s+")
+_RE_NONALNUM = re.compile(r"[^0-9a-zA-Z\s]")
+_RE_REMIX_PAREN = re.compile(r"\(([^)]*remix[^)]*)\)", re.IGNORECASE)
+_RE_REMIX_BRACK = re.compile(r"\[([^]]*remix[^]]*)\]", re.IGNORECASE)
+_RE_REMIX_WORD = re.compile(r"\bremix\b", re.IGNORECASE)
+
+# ASCII translation: keep alnum (lowercased) and whitespace, everything else -> space
+_ASCII_NORM_TABLE = {
+    c: (chr(c).lower() if chr(c).isalnum() else chr(c) if chr(c).isspace() else " ")
+    for c in range(128)
+}
+
+
+@lru_cache(maxsize=4096)
 def _strip_parentheses_with_feat(s: Optional[str]) -> str:
     """
     Remove parenthesized or bracketed substrings that contain "feat" (or "ft").
     """
     if not s:
         return ""
+    # Most inputs have no brackets at all: only the whitespace collapse applies
+    if "(" not in s and "[" not in s:
+        return " ".join(s.split())
 
     def repl(m):
         inner = m.group(1)
-        if re.search(r"\b(feat\.?|ft\.?)\b", inner, flags=re.IGNORECASE):
+        if _RE_FEAT.search(inner):
             return " "
         return m.group(0)
 
-    s = re.sub(r"\(([^)]*)\)", repl, s)
-    s = re.sub(r"\[([^]]*)\]", repl, s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _RE_PAREN.sub(repl, s)
+    s = _RE_BRACK.sub(repl, s)
+    s = _RE_WS.sub(" ", s).strip()
     return s
 
 
@@ -38,33 +60,38 @@ def _extract_remixer_tokens_from_title(s: Optional[str]) -> List[str]:
     res: List[str] = []
 
     def _extract_from_matches(pattern):
-        for m in re.finditer(pattern, s, flags=re.IGNORECASE):
-            inner = m.group(1)
-            name = re.sub(r"\bremix\b", " ", inner, flags=re.IGNORECASE)
-            name = re.sub(r"[^0-9a-zA-Z\s]", " ", name)
-            name = unicodedata.normalize("NFKD", name)
-            name = "".join(ch for ch in name if not unicodedata.combining(ch))
-            name = re.sub(r"\s+", " ", name).strip().lower()
-            if name:
-                res.extend([t for t in name.split() if t])
-
-    _extract_from_matches(r"\(([^)]*remix[^)]*)\)")
-    _extract_from_matches(r"\[([^]]*remix[^]]*)\]")
+        for m in pattern.finditer(s):
+            name = _RE_REMIX_WORD.sub(" ", m.group(1))
+            # Only ASCII alnum and whitespace survive this step, so NFKD / combining
+            # mark removal afterwards cannot change the tokens and is skipped.
+            if name.isascii():
+                name = name.translate(_ASCII_NORM_TABLE)
+            else:
+                name = _RE_NONALNUM.sub(" ", name).lower()
+            res.extend(name.split())
+
+    _extract_from_matches(_RE_REMIX_PAREN)
+    _extract_from_matches(_RE_REMIX_BRACK)
     return res
 
 
+@lru_cache(maxsize=8192)
 def _normalize_text_basic(s: Optional[str]) -> str:
     if not s:
         return ""
     s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[()]+", " ", s)
-    s = re.sub(r"\b(feat\.?|ft\.?)\b", " ", s, flags=re.IGNORECASE)
-    s = re.sub(r"[^0-9a-zA-Z\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip().lower()
-    return s
-
-
+    if s.isascii():
+        # No combining marks possible; one translate pass replaces punctuation
+        # (parentheses included) with spaces and lowercases
+        s = _RE_FEAT.sub(" ", s).translate(_ASCII_NORM_TABLE)
+    else:
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
+        s = _RE_FEAT.sub(" ", s)
+        s = _RE_NONALNUM.sub(" ", s).lower()
+    return " ".join(s.split())
+
+
+@lru_cache(maxsize=8192)
 def _normalize_artist_for_search(s: Optional[str]) -> str:
     if not s:
         return ""
@@ -73,6 +100,7 @@ def _normalize_artist_for_search(s: Optional[str]) -> str:
     return _normalize_text_basic(s2)
 
 
+@lru_cache(maxsize=8192)
 def _normalize_title_for_search(s: Optional[str]) -> str:
     if not s:
         return ""
@@ -86,17 +114,22 @@ def _tokens(n: str) -> List[str]:
     return [t for t in n.split() if t]
 
 
-def _tokens_in_candidate(tokens: List[str], candidate_norm: str) -> bool:
+def _tokens_in_candidate(tokens: Iterable[str], candidate_norm: str) -> bool:
+    """
+    True if every token occurs in candidate_norm. Callers in a loop should pass a
+    frozenset built once per query.
+    """
     if not tokens:
         return True
-    cand_set = set(candidate_norm.split())
-    return all(tok in cand_set for tok in tokens)
+    if not isinstance(tokens, frozenset):
+        tokens = frozenset(tokens)
+    return tokens.issubset(candidate_norm.split())
 
 
 def _build_sanitized_query(n_artist: str, n_title: str, n_album: str, fielded: bool = True) -> str:
     def quote_and_escape(s: str) -> str:
         s2 = s.replace('"', ' ')
-        s2 = re.sub(r'\s+', ' ', s2).strip()
+        s2 = _RE_WS.sub(' ', s2).strip()
         return f'"{s2}"' if s2 else ''
     if fielded and (n_artist or n_title or n_album):
         parts = []
@@ -115,3 +148,12 @@ def _build_sanitized_query(n_artist: str, n_title: str, n_album: str, fielded: b
     if n_album:
         parts.append(n_album)
     return " ".join(parts) if parts else '""'
+
+
+def clear_caches() -> None:
+    """
+    Clear the memoized normalization results (e.g. between tests).
+    """
+    for fn in (_strip_parentheses_with_feat, _normalize_text_basic,
+               _normalize_artist_for_search, _normalize_title_for_search):
+        fn.cache_clear()
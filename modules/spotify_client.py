@@ -3,13 +3,22 @@ modules/spotify_client.py
 Functions to obtain tokens and query the Spotify Web API.
 """
 
-from typing import Optional, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 import base64
+import json
+import os
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 
 from config import (
+    TOKEN_CACHE_PATH,
     SPOTIFY_TOKEN_URL,
     SPOTIFY_SEARCH_URL,
     SPOTIFY_ARTIST_URL,
@@ -17,11 +26,21 @@ from config import (
     SPOTIFY_ALBUM_TRACKS_URL,
     REQUEST_TIMEOUT,
     SPOTIFY_MAX_LIMIT,
+    SPOTIFY_MAX_CONCURRENT_REQUESTS,
     MARKET,
     SEARCH_CANDIDATE_LIMIT,
     PRINT_SEARCH_INFO,
 )
 
+from modules import cache
+
+# orjson decodes response bodies faster when available; stdlib json otherwise
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 # Reuse normalization helpers from search_utils
 try:
     from modules.search_utils import (
@@ -56,6 +75,92 @@ except Exception:
         def _normalize_text_basic(s): return s or ""
 
 
+# Longest Retry-After (seconds) a single adapter retry sleeps for
+_RETRY_AFTER_CAP = 10
+
+
+class _CappedRetry(Retry):
+    """
+    Retry that honours Retry-After but sleeps at most _RETRY_AFTER_CAP per attempt,
+    so a long rate-limit window cannot park a worker inside one request; a 429 that
+    outlasts the retries is handled by the rate-limit gate in _spotify_get.
+    """
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, _RETRY_AFTER_CAP)
+
+
+# One pooled session for all Spotify API and cover-art requests so TLS connections
+# are reused across calls; transient 429/5xx responses are retried with backoff.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=_CappedRetry(total=6, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                             respect_retry_after_header=True, raise_on_status=False),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# Shared across worker threads to cap in-flight Spotify API requests
+_SPOTIFY_SEMAPHORE = threading.BoundedSemaphore(max(1, int(SPOTIFY_MAX_CONCURRENT_REQUESTS)))
+
+
+# A 429 that survives the adapter's retries pauses every worker until Retry-After has passed
+_rate_limit_until = 0.0
+_MAX_RATE_LIMIT_WAIT = 120
+
+
+class SpotifyRateLimited(Exception):
+    """
+    Raised when Spotify keeps answering 429 after retries. Unlike other request
+    failures it is not turned into a "no result", so callers do not record false misses.
+    """
+
+
+def _spotify_get(url: str, headers: dict, params: Optional[dict] = None) -> requests.Response:
+    """
+    GET a Spotify Web API endpoint while holding the shared concurrency semaphore.
+    Raises SpotifyRateLimited on a final 429.
+    """
+    global _rate_limit_until
+    wait = _rate_limit_until - time.time()
+    if wait > 0:
+        time.sleep(min(wait, _MAX_RATE_LIMIT_WAIT))
+    with _SPOTIFY_SEMAPHORE:
+        r = SESSION.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+    if r.status_code == 429:
+        try:
+            retry_after = float(r.headers.get("Retry-After", 1))
+        except ValueError:
+            retry_after = 1.0
+        _rate_limit_until = max(_rate_limit_until, time.time() + min(retry_after, _MAX_RATE_LIMIT_WAIT))
+        logging.error("Spotify rate limit hit; pausing requests for %.0fs", retry_after)
+        raise SpotifyRateLimited(url)
+    return r
+
+
+def spotify_get_json(url: str, token: str, params: Optional[dict] = None) -> Optional[dict]:
+    """
+    GET a Spotify Web API endpoint with a bearer token and return the parsed JSON,
+    or None on any failure. Raises SpotifyRateLimited on a final 429.
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        r = _spotify_get(url, headers, params)
+    except SpotifyRateLimited:
+        raise
+    except Exception:
+        return None
+    if not r.ok:
+        return None
+    try:
+        return _loads(r.content)
+    except Exception:
+        return None
+
+
 def get_spotify_token(client_id: str, client_secret: str, ttl_margin: int = 5) -> Tuple[str, int]:
     """
     Obtain an OAuth access token from Spotify using the Client Credentials flow.
@@ -63,7 +168,7 @@ def get_spotify_token(client_id: str, client_secret: str, ttl_margin: int = 5) -
     auth = base64.b64encode(f"{client_id}:{client_secret}".encode("utf-8")).decode("ascii")
     headers = {"Authorization": f"Basic {auth}"}
     data = {"grant_type": "client_credentials"}
-    resp = requests.post(SPOTIFY_TOKEN_URL, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
+    resp = SESSION.post(SPOTIFY_TOKEN_URL, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
     j = resp.json()
     token = j["access_token"]
@@ -72,66 +177,237 @@ def get_spotify_token(client_id: str, client_secret: str, ttl_margin: int = 5) -
     return token, expires_at
 
 
+# In-memory copy of the cached token: {client_id: (token, expires_at)}
+_TOKEN_MEMO: Dict[str, Tuple[str, int]] = {}
+_TOKEN_LOCK = threading.Lock()
+
+
+def get_spotify_token_cached(client_id: str, client_secret: str, cache_path: Path = TOKEN_CACHE_PATH,
+                             buffer: int = 60) -> Tuple[str, int]:
+    """
+    Return a token cached in memory or on disk while it has more than `buffer` seconds left;
+    otherwise obtain a new one via get_spotify_token and write it back atomically.
+    """
+    with _TOKEN_LOCK:
+        return _get_spotify_token_cached(client_id, client_secret, cache_path, buffer)
+
+
+def _get_spotify_token_cached(client_id: str, client_secret: str, cache_path: Path, buffer: int) -> Tuple[str, int]:
+    memo = _TOKEN_MEMO.get(client_id)
+    if memo and memo[1] - buffer > time.time():
+        return memo
+    try:
+        with Path(cache_path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("client_id") == client_id and int(data["expires_at"]) - buffer > time.time():
+            _TOKEN_MEMO[client_id] = (str(data["access_token"]), int(data["expires_at"]))
+            return _TOKEN_MEMO[client_id]
+    except Exception:
+        pass
+
+    token, expires_at = get_spotify_token(client_id, client_secret)
+    _TOKEN_MEMO[client_id] = (token, expires_at)
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        # The file holds a bearer token, so create it readable by the owner only
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"client_id": client_id, "access_token": token, "expires_at": expires_at}, f)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logging.info("Could not write Spotify token cache %s: %s", cache_path, e)
+        try:
+            os.unlink(tmp_path)
+        except Exception:
+            pass
+    return token, expires_at
+
+
 def spotifysearch(token: str, q: str, type_: str = "track", limit: int = 20, offset: int = 0, market: Optional[str] = None) -> Optional[dict]:
     """
     This wrapper sends a GET request to the configured search endpoint and
     returns the parsed JSON response on success or `None` on error. It handles
     network errors and basic 401/unauthorized checks.
     """
-    headers = {"Authorization": f"Bearer {token}"}
     params = {"q": q, "type": type_, "limit": limit, "offset": offset}
     if market:
         params["market"] = market
-    try:
-        r = requests.get(SPOTIFY_SEARCH_URL, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
-    except Exception:
-        return None
-    if r.status_code == 401 or not r.ok:
-        return None
-    try:
-        return r.json()
-    except Exception:
+    return spotify_get_json(SPOTIFY_SEARCH_URL, token, params)
+
+
+def spotify_search_isrc(token: str, isrc: str) -> Optional[dict]:
+    """
+    Return the first Spotify track matching an ISRC, or None.
+    Matches are read from / written to the persistent cache.
+    """
+    cached = cache.get_isrc_track(isrc)
+    if cached:
+        return cached
+    isrc_q = f'isrc:"{isrc.strip()}"'
+    if PRINT_SEARCH_INFO:
+        logging.info("Attempting ISRC search: %s", isrc_q)
+    j = spotifysearch(token, isrc_q, type_="track", limit=1, offset=0, market=MARKET)
+    if j:
+        items = j.get("tracks", {}).get("items", [])
+        if items:
+            cache.put_isrc_track(isrc, items[0])
+            return items[0]
+    return None
+
+
+def spotify_search_artist_id(token: str, artist: str) -> Optional[str]:
+    """
+    Return the Spotify id of the best artist match for a (normalized) artist name, or None.
+    """
+    n_artist = _normalize_artist_for_search(artist)
+    if not n_artist:
         return None
+    j = spotifysearch(token, f'artist:"{n_artist}"', type_="artist", limit=1, offset=0, market=MARKET)
+    items = j.get("artists", {}).get("items", []) if j else []
+    return items[0].get("id") if items else None
+
+
+def resolve_isrc_matches(token: str, isrcs: Iterable[str], max_workers: int = 1) -> Dict[str, Optional[dict]]:
+    """
+    Resolve a batch of ISRCs up front, searching each distinct ISRC once.
+    Spotify has no multi-ISRC lookup, so distinct ISRCs are searched on a small
+    thread pool (still bounded by the shared request semaphore).
+    Returns {isrc: track or None}; rate-limited ISRCs are left out so they are searched again later.
+    """
+    unique = list(dict.fromkeys(i.strip() for i in isrcs if i and i.strip()))
+    if not unique:
+        return {}
+    limited = object()
+
+    def _search(isrc):
+        try:
+            return spotify_search_isrc(token, isrc)
+        except SpotifyRateLimited:
+            return limited
+        except Exception:
+            return None
+
+    if max_workers > 1 and len(unique) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as ex:
+            results = list(ex.map(_search, unique))
+    else:
+        results = [_search(i) for i in unique]
+    return {isrc: m for isrc, m in zip(unique, results) if m is not limited}
 
 
 def spotify_get_artist_albums(token: str, artist_id: str, limit: int = SPOTIFY_MAX_LIMIT, offset: int = 0, market: Optional[str] = None) -> Optional[dict]:
     """
     Retrieve albums for a given artist using Spotify's artist albums endpoint.
     """
-    headers = {"Authorization": f"Bearer {token}"}
     params = {"limit": limit, "offset": offset}
     if market:
         params["market"] = market
-    try:
-        r = requests.get(SPOTIFY_ARTIST_ALBUMS_URL.format(artist_id), headers=headers, params=params, timeout=REQUEST_TIMEOUT)
-    except Exception:
-        return None
-    if not r.ok:
-        return None
-    try:
-        return r.json()
-    except Exception:
-        return None
+    return spotify_get_json(SPOTIFY_ARTIST_ALBUMS_URL.format(artist_id), token, params)
 
 
 def spotify_get_album_tracks(token: str, album_id: str, limit: int = SPOTIFY_MAX_LIMIT, offset: int = 0, market: Optional[str] = None) -> Optional[dict]:
     """
     Retrieve tracks for a given album using Spotify's album tracks endpoint.
     """
-    headers = {"Authorization": f"Bearer {token}"}
     params = {"limit": limit, "offset": offset}
     if market:
         params["market"] = market
-    try:
-        r = requests.get(SPOTIFY_ALBUM_TRACKS_URL.format(album_id), headers=headers, params=params, timeout=REQUEST_TIMEOUT)
-    except Exception:
-        return None
-    if not r.ok:
-        return None
-    try:
-        return r.json()
-    except Exception:
-        return None
+    return spotify_get_json(SPOTIFY_ALBUM_TRACKS_URL.format(album_id), token, params)
+
+
+# Pages of one search query are requested concurrently (still bounded by _SPOTIFY_SEMAPHORE)
+_PAGE_POOL: Optional[ThreadPoolExecutor] = None
+_PAGE_POOL_LOCK = threading.Lock()
+
+
+def _page_pool() -> ThreadPoolExecutor:
+    """
+    Return the search-page pool, creating it on first use.
+    """
+    global _PAGE_POOL
+    if _PAGE_POOL is None:
+        with _PAGE_POOL_LOCK:
+            if _PAGE_POOL is None:
+                _PAGE_POOL = ThreadPoolExecutor(max_workers=max(1, int(SPOTIFY_MAX_CONCURRENT_REQUESTS)),
+                                                thread_name_prefix="spotify-page")
+    return _PAGE_POOL
+
+
+def _prefetch_search_pages(token: str, q: str, kind: str, budget: int) -> Dict[int, Tuple[int, Future]]:
+    """
+    When a query needs more than one page to cover `budget` results, start all
+    page requests at once. Returns {offset: (limit, future)}; single-page queries
+    return {} and are fetched inline by the caller.
+    """
+    pages = []
+    offset = 0
+    while budget > 0:
+        limit = min(SPOTIFY_MAX_LIMIT, budget)
+        pages.append((offset, limit))
+        offset += limit
+        budget -= limit
+    if len(pages) < 2:
+        return {}
+    return {o: (l, _page_pool().submit(spotifysearch, token, q, type_=kind, limit=l, offset=o, market=MARKET))
+            for o, l in pages}
+
+
+# Albums whose track listings are fetched ahead in the artist fallback
+_ALBUM_TRACKS_WINDOW = max(1, int(SPOTIFY_MAX_CONCURRENT_REQUESTS))
+
+
+def _fetch_album_tracks_all_pages(token: str, album_id: str) -> List[dict]:
+    """
+    Return every track item of an album, following pagination until a short or failed page.
+    """
+    tracks_all: List[dict] = []
+    t_off = 0
+    while True:
+        t_resp = spotify_get_album_tracks(token, album_id, limit=SPOTIFY_MAX_LIMIT, offset=t_off, market=MARKET)
+        if not t_resp:
+            break
+        tracks = t_resp.get("items", []) or []
+        if not tracks:
+            break
+        tracks_all.extend(tracks)
+        if len(tracks) < SPOTIFY_MAX_LIMIT:
+            break
+        t_off += SPOTIFY_MAX_LIMIT
+    return tracks_all
+
+
+@lru_cache(maxsize=2048)
+def _prepare_search_inputs(artist: Optional[str], title: Optional[str], album: Optional[str]):
+    """
+    Normalized fields, token sets and the query list for one (artist, title, album)
+    search. Memoized: repeated lookups for the same inputs skip this work.
+    """
+    n_artist = _normalize_artist_for_search(artist) if artist else ""
+    n_title = _normalize_title_for_search(title) if title else ""
+    n_album = _normalize_title_for_search(album) if album else ""
+
+    # Token sets are built once per search and reused for every candidate
+    artist_tokens = frozenset(_tokens(n_artist))
+    title_tokens = frozenset(_tokens(n_title))
+    album_tokens = frozenset(_tokens(n_album))
+    remixer_tokens = frozenset(_extract_remixer_tokens_from_title(title or ""))
+
+    # Build queries: fielded first, then plain; identical query strings are sent once
+    queries = []
+    seen_queries = set()
+    for kind, q in (
+        ("track", _build_sanitized_query(n_artist, n_title, n_album, fielded=True)),
+        ("track", _build_sanitized_query(n_artist, n_title, "", fielded=True)),
+        ("album", _build_sanitized_query(n_artist, "", n_album, fielded=True)),
+        ("track", _build_sanitized_query("", n_title, "", fielded=True)),
+        ("album", _build_sanitized_query("", "", n_album, fielded=True)),
+        ("track", _build_sanitized_query(n_artist, n_title, n_album, fielded=False)),
+    ):
+        if q and q not in seen_queries:
+            seen_queries.add(q)
+            queries.append((kind, q))
+    return (n_artist, n_title, n_album, artist_tokens, title_tokens, album_tokens,
+            remixer_tokens, tuple(queries))
 
 
 def spotify_find_best_match(token: str, artist: Optional[str], album: Optional[str], title: Optional[str],
@@ -147,111 +423,107 @@ def spotify_find_best_match(token: str, artist: Optional[str], album: Optional[s
     """
     if combined_limit is None:
         combined_limit = SEARCH_CANDIDATE_LIMIT
+    # Checked once per search: per-candidate logging is skipped unless it would be emitted
+    log_info = bool(PRINT_SEARCH_INFO) and logging.getLogger().isEnabledFor(logging.INFO)
 
-    n_artist = _normalize_artist_for_search(artist) if artist else ""
-    n_title = _normalize_title_for_search(title) if title else ""
-    n_album = _normalize_title_for_search(album) if album else ""
-
-    artist_tokens = _tokens(n_artist)
-    title_tokens = _tokens(n_title)
-    album_tokens = _tokens(n_album)
-    remixer_tokens = _extract_remixer_tokens_from_title(title or "")
+    n_artist, n_title, n_album, artist_tokens, title_tokens, album_tokens, remixer_tokens, queries = \
+        _prepare_search_inputs(artist, title, album)
 
-    if PRINT_SEARCH_INFO:
+    if log_info:
         logging.info("Sanitized search input: artist='%s' | title='%s' | album='%s'", n_artist, n_title, n_album)
 
-    # Build queries: fielded first, then plain
-    queries = []
-    primary_q_fielded = _build_sanitized_query(n_artist, n_title, n_album, fielded=True)
-    if primary_q_fielded:
-        queries.append(("track", primary_q_fielded))
-    at_q_fielded = _build_sanitized_query(n_artist, n_title, "", fielded=True)
-    if at_q_fielded and at_q_fielded != primary_q_fielded:
-        queries.append(("track", at_q_fielded))
-    aa_q_fielded = _build_sanitized_query(n_artist, "", n_album, fielded=True)
-    if aa_q_fielded and aa_q_fielded not in (primary_q_fielded, at_q_fielded):
-        queries.append(("album", aa_q_fielded))
-    t_q_fielded = _build_sanitized_query("", n_title, "", fielded=True)
-    if t_q_fielded and t_q_fielded not in (primary_q_fielded, at_q_fielded, aa_q_fielded):
-        queries.append(("track", t_q_fielded))
-    a_q_fielded = _build_sanitized_query("", "", n_album, fielded=True)
-    if a_q_fielded and a_q_fielded not in (primary_q_fielded, at_q_fielded, aa_q_fielded, t_q_fielded):
-        queries.append(("album", a_q_fielded))
-
-    primary_q_plain = _build_sanitized_query(n_artist, n_title, n_album, fielded=False)
-    if primary_q_plain and primary_q_plain not in (q for _, q in queries):
-        queries.append(("track", primary_q_plain))
-
     seen_keys = set()
     overall_idx = 0
 
     for (kind, q) in queries:
-        if PRINT_SEARCH_INFO:
+        if log_info:
             logging.info("Query base: '%s' | type=%s | target=%d", q, kind, combined_limit)
-        offset = 0
-        while True:
-            per_request = min(SPOTIFY_MAX_LIMIT, combined_limit - overall_idx)
-            if per_request <= 0:
-                break
-            if PRINT_SEARCH_INFO:
-                logging.info("Searching Spotify: q='%s' type=%s limit=%d offset=%d market=%s", q, kind, per_request, offset, MARKET)
-            j = spotifysearch(token, q, type_=kind, limit=per_request, offset=offset, market=MARKET)
-            if not j:
-                break
-            items = j.get((kind + "s") if kind in ("album", "track") else "tracks", {}).get("items", [])
-            if not isinstance(items, list) or not items:
-                break
-            for it in items:
-                it_id = it.get("id")
-                if it_id:
-                    key = f"id:{it_id}"
+        items_key = (kind + "s") if kind in ("album", "track") else "tracks"
+        prefetched = _prefetch_search_pages(token, q, kind, combined_limit - overall_idx)
+        # Pages not consumed (accepted match, short page) are dropped
+        try:
+            offset = 0
+            while True:
+                per_request = min(SPOTIFY_MAX_LIMIT, combined_limit - overall_idx)
+                if per_request <= 0:
+                    break
+                if log_info:
+                    logging.info("Searching Spotify: q='%s' type=%s limit=%d offset=%d market=%s", q, kind, per_request, offset, MARKET)
+                page = prefetched.pop(offset, None)
+                if page is None:
+                    j = spotifysearch(token, q, type_=kind, limit=per_request, offset=offset, market=MARKET)
                 else:
+                    limit, fut = page
+                    j = fut.result()
+                    head = j.get(items_key, {}).get("items", []) if j else None
+                    if isinstance(head, list) and len(head) == limit < per_request:
+                        # Skipped duplicates left room for more candidates than the page was
+                        # prefetched with: only the missing tail is requested
+                        tail = spotifysearch(token, q, type_=kind, limit=per_request - limit, offset=offset + limit, market=MARKET)
+                        tail_items = tail.get(items_key, {}).get("items", []) if tail else []
+                        if isinstance(tail_items, list):
+                            j = {items_key: {"items": head + tail_items}}
+                if not j:
+                    break
+                items = j.get(items_key, {}).get("items", [])
+                if not isinstance(items, list) or not items:
+                    break
+                for it in items:
+                    it_id = it.get("id")
+                    # Items with an id are deduplicated before any normalization work
+                    if it_id:
+                        key = f"id:{it_id}"
+                        if key in seen_keys:
+                            continue
                     cand_title = _normalize_text_basic(it.get("name"))
                     cand_artists = " ".join(a.get("name", "") for a in it.get("artists", []))
-                    cand_artist_norm = _normalize_artist_for_search(cand_artists)
-                    album_info = (it.get("album") or {}) if kind == "track" else it
-                    cand_album_name = _normalize_title_for_search((album_info.get("name") or ""))
-                    key = f"key:{cand_title}|{cand_artist_norm}|{cand_album_name}"
-                if key in seen_keys:
-                    continue
-                overall_idx += 1
-                seen_keys.add(key)
-                if kind == "track":
-                    cand_title = _normalize_text_basic(it.get("name"))
-                    cand_artists = " ".join(a.get("name", "") for a in it.get("artists", []))
-                    cand_artist_norm = _normalize_artist_for_search(cand_artists)
-                    album_info = it.get("album", {}) or {}
-                    cand_album_name = _normalize_title_for_search(album_info.get("name"))
-                else:
-                    cand_title = _normalize_text_basic(it.get("name"))
-                    cand_artist_norm = _normalize_text_basic(" ".join(a.get("name", "") for a in it.get("artists", [])))
-                    cand_album_name = cand_title
-                if PRINT_SEARCH_INFO:
-                    logging.info("Candidate #%d: title='%s' | artist='%s' | album='%s'", overall_idx, cand_title, cand_artist_norm, cand_album_name)
-                title_ok = _tokens_in_candidate(title_tokens, cand_title)
-                artist_ok = (not artist_tokens) or _tokens_in_candidate(artist_tokens, cand_artist_norm) or (remixer_tokens and _tokens_in_candidate(remixer_tokens, cand_artist_norm))
-                album_ok = True
-                if album_tokens:
-                    album_ok = _tokens_in_candidate(album_tokens, cand_album_name)
-                accepted = bool(title_ok and artist_ok and album_ok)
-                if PRINT_SEARCH_INFO:
-                    logging.info("ACCEPTED" if accepted else "REJECTED")
-                if accepted:
-                    return it
+                    if kind == "track":
+                        cand_artist_norm = _normalize_artist_for_search(cand_artists)
+                        cand_album_name = _normalize_title_for_search((it.get("album") or {}).get("name"))
+                    else:
+                        cand_artist_norm = _normalize_text_basic(cand_artists)
+                        cand_album_name = cand_title
+                    if not it_id:
+                        # Id-less items key on search-style normalized fields (reused for tracks)
+                        if kind == "track":
+                            key = f"key:{cand_title}|{cand_artist_norm}|{cand_album_name}"
+                        else:
+                            key = f"key:{cand_title}|{_normalize_artist_for_search(cand_artists)}|{_normalize_title_for_search(it.get('name'))}"
+                        if key in seen_keys:
+                            continue
+                    overall_idx += 1
+                    seen_keys.add(key)
+                    if log_info:
+                        logging.info("Candidate #%d: title='%s' | artist='%s' | album='%s'", overall_idx, cand_title, cand_artist_norm, cand_album_name)
+                    title_ok = title_tokens.issubset(cand_title.split())
+                    # The candidate's artist words are split once for both the artist and remixer checks
+                    cand_artist_words = frozenset(cand_artist_norm.split())
+                    artist_ok = (not artist_tokens) or artist_tokens <= cand_artist_words or (remixer_tokens and remixer_tokens <= cand_artist_words)
+                    album_ok = True
+                    if album_tokens:
+                        album_ok = album_tokens.issubset(cand_album_name.split())
+                    accepted = bool(title_ok and artist_ok and album_ok)
+                    if log_info:
+                        logging.info("ACCEPTED" if accepted else "REJECTED")
+                    if accepted:
+                        return it
+                    if overall_idx >= combined_limit:
+                        break
                 if overall_idx >= combined_limit:
                     break
-            if overall_idx >= combined_limit:
-                break
-            offset += per_request
-            if len(items) < per_request:
-                break
+                offset += per_request
+                if len(items) < per_request:
+                    break
+        finally:
+            for _, fut in prefetched.values():
+                fut.cancel()
         if overall_idx >= combined_limit:
             break
 
     # Fallback: artist->albums->tracks exploration
     if n_artist:
         artist_search_q = f'artist:"{n_artist}"'
-        if PRINT_SEARCH_INFO:
+        if log_info:
             logging.info("Fallback artist search: %s", artist_search_q)
         artist_resp = spotifysearch(token, artist_search_q, type_="artist", limit=1, offset=0, market=MARKET)
         artist_items = []
@@ -261,7 +533,7 @@ def spotify_find_best_match(token: str, artist: Optional[str], album: Optional[s
             artist_items = []
         if artist_items:
             artist_id = artist_items[0].get("id")
-            if PRINT_SEARCH_INFO:
+            if log_info:
                 logging.info("Found artist id=%s; enumerating albums", artist_id)
             if artist_id:
                 a_off = 0
@@ -272,18 +544,17 @@ def spotify_find_best_match(token: str, artist: Optional[str], album: Optional[s
                     albums = a_resp.get("items", []) or []
                     if not albums:
                         break
-                    for alb in albums:
-                        alb_id = alb.get("id")
-                        if not alb_id:
-                            continue
-                        t_off = 0
-                        while True:
-                            t_resp = spotify_get_album_tracks(token, alb_id, limit=SPOTIFY_MAX_LIMIT, offset=t_off, market=MARKET)
-                            if not t_resp:
-                                break
-                            tracks = t_resp.get("items", []) or []
-                            if not tracks:
-                                break
+                    # Track listings of the next few albums download concurrently but are
+                    # scanned in album order, so the accepted match is the same as a serial scan
+                    with_id = [alb for alb in albums if alb.get("id")]
+                    pending = {}
+                    try:
+                        for idx, alb in enumerate(with_id):
+                            for ahead in range(idx, min(idx + _ALBUM_TRACKS_WINDOW, len(with_id))):
+                                if ahead not in pending:
+                                    pending[ahead] = _page_pool().submit(_fetch_album_tracks_all_pages, token, with_id[ahead]["id"])
+                            tracks = pending.pop(idx).result()
+                            cand_album_name = _normalize_title_for_search(alb.get("name"))
                             for tr in tracks:
                                 tr_id = tr.get("id")
                                 if tr_id and f"id:{tr_id}" in seen_keys:
@@ -292,18 +563,19 @@ def spotify_find_best_match(token: str, artist: Optional[str], album: Optional[s
                                 cand_title = _normalize_text_basic(it_like.get("name"))
                                 cand_artists = " ".join(a.get("name", "") for a in it_like.get("artists", []))
                                 cand_artist_norm = _normalize_artist_for_search(cand_artists)
-                                cand_album_name = _normalize_title_for_search(alb.get("name"))
-                                title_ok = _tokens_in_candidate(title_tokens, cand_title)
-                                artist_ok = (not artist_tokens) or _tokens_in_candidate(artist_tokens, cand_artist_norm) or (remixer_tokens and _tokens_in_candidate(remixer_tokens, cand_artist_norm))
+                                title_ok = title_tokens.issubset(cand_title.split())
+                                cand_artist_words = frozenset(cand_artist_norm.split())
+                                artist_ok = (not artist_tokens) or artist_tokens <= cand_artist_words or (remixer_tokens and remixer_tokens <= cand_artist_words)
                                 album_ok = True
                                 if album_tokens:
-                                    album_ok = _tokens_in_candidate(album_tokens, cand_album_name)
+                                    album_ok = album_tokens.issubset(cand_album_name.split())
                                 if title_ok and artist_ok and album_ok:
                                     return it_like
                                 seen_keys.add(f"id:{tr_id}" if tr_id else f"key:{cand_title}|{cand_artist_norm}|{cand_album_name}")
-                            if len(tracks) < SPOTIFY_MAX_LIMIT:
-                                break
-                            t_off += SPOTIFY_MAX_LIMIT
+                    finally:
+                        # Listings still in flight are not needed once the scan stops, whatever the reason
+                        for fut in pending.values():
+                            fut.cancel()
                     if len(albums) < SPOTIFY_MAX_LIMIT:
                         break
                     a_off += SPOTIFY_MAX_LIMIT
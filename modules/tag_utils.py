@@ -4,33 +4,48 @@ Utilities for downloading images, obtaining artist genres, and constructing/mani
 """
 
 from pathlib import Path
-from typing import List, Optional, Tuple
-import requests
-import logging
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
 import io
 import struct
-import unicodedata
-import tempfile
-import wave
 
 # Mutagen imports
-from mutagen.flac import FLAC, Picture
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC, TRCK, TPOS, TCON, TSRC, ID3NoHeaderError
-from mutagen.wave import WAVE
+from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC, TRCK, TPOS, TCON, TSRC
 
 # Import endpoints for artist lookup from config.py (required)
-from config import SPOTIFY_ARTIST_URL, REQUEST_TIMEOUT
+from config import SPOTIFY_ARTIST_URL, SPOTIFY_ARTISTS_URL, REQUEST_TIMEOUT
+from modules.spotify_client import SESSION, SpotifyRateLimited, spotify_get_json
+from modules import cache
+
+
+# Cover art larger than this is not embedded
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+@lru_cache(maxsize=64)
+def _fetch_image(url: str) -> Tuple[bytes, str]:
+    # Raises on failure so that failed downloads are not cached
+    with SESSION.get(url, timeout=REQUEST_TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        mime = r.headers.get("Content-Type", "") or "image/jpeg"
+        # Chunks are joined once at the end: the image is copied a single time
+        chunks = []
+        size = 0
+        for chunk in r.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes: {url}")
+        return b"".join(chunks), mime
 
 
 def download_image_bytes(url: str) -> Optional[Tuple[bytes, str]]:
     """
     Download image bytes from URL and return (bytes, mime) or None on failure.
+    Tracks of one album share a cover URL, so recent downloads are kept in memory.
     """
     try:
-        r = requests.get(url, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        mime = r.headers.get("Content-Type", "") or "image/jpeg"
-        return r.content, mime
+        return _fetch_image(url)
     except Exception:
         return None
 
@@ -38,47 +53,66 @@ def download_image_bytes(url: str) -> Optional[Tuple[bytes, str]]:
 def get_artist_genres(token: str, artist_id: str) -> List[str]:
     """
     Return artist genres list from Spotify artist endpoint or empty list.
+    Successful lookups are read from / written to the persistent cache.
+    Raises SpotifyRateLimited on a final 429 instead of returning (and caching) nothing.
     """
-    try:
-        headers = {"Authorization": f"Bearer {token}"}
-        r = requests.get(SPOTIFY_ARTIST_URL.format(artist_id), headers=headers, timeout=REQUEST_TIMEOUT)
-        if r.ok:
-            j = r.json()
-            genres = j.get("genres", [])
-            if isinstance(genres, list):
-                return genres
-    except Exception:
-        pass
+    cached = cache.get_artist_genres(artist_id)
+    if cached is not None:
+        return cached
+    j = spotify_get_json(SPOTIFY_ARTIST_URL.format(artist_id), token)
+    genres = j.get("genres", []) if j else None
+    if isinstance(genres, list):
+        cache.put_artist_genres(artist_id, genres)
+        return genres
     return []
 
 
+def prefetch_artist_genres(token: str, artist_ids: Iterable[str]) -> None:
+    """
+    Fill the genre cache for many artists at once via /v1/artists?ids= (up to 50 ids
+    per request), so later get_artist_genres calls are plain cache hits.
+    """
+    missing = [a for a in dict.fromkeys(artist_ids) if a and cache.get_artist_genres(a) is None]
+    for i in range(0, len(missing), 50):
+        try:
+            j = spotify_get_json(SPOTIFY_ARTISTS_URL, token, params={"ids": ",".join(missing[i:i + 50])})
+        except SpotifyRateLimited:
+            # The remaining artists are fetched one by one by get_artist_genres later
+            return
+        for artist in (j or {}).get("artists") or []:
+            if artist and isinstance(artist.get("genres"), list):
+                cache.put_artist_genres(artist["id"], artist["genres"])
+
+
 def remove_existing_pictures_generic(path: Path, audio_obj) -> None:
     """
     Remove existing embedded pictures from an audio object (ID3/FLAC).
     """
-    ext = path.suffix.lower()
+    if isinstance(audio_obj, ID3):
+        audio_obj.delall("APIC")
+    elif path.suffix.lower() == ".flac":
+        if hasattr(audio_obj, "clear_pictures"):
+            audio_obj.clear_pictures()
+        elif hasattr(audio_obj, "pictures"):
+            audio_obj.pictures[:] = []
+
+
+def has_identical_picture(audio_obj, image_bytes: bytes, mime: str) -> bool:
+    """
+    True if audio_obj (ID3/FLAC) already holds exactly this image as its only
+    front cover, so replacing the pictures would not change anything.
+    """
     try:
         if isinstance(audio_obj, ID3):
-            try:
-                audio_obj.delall("APIC")
-            except Exception:
-                pass
-            return
-        if ext == ".flac":
-            if hasattr(audio_obj, "clear_pictures"):
-                try:
-                    audio_obj.clear_pictures()
-                    return
-                except Exception:
-                    pass
-            if hasattr(audio_obj, "pictures"):
-                try:
-                    audio_obj.pictures[:] = []
-                    return
-                except Exception:
-                    pass
+            pics, desc = audio_obj.getall("APIC"), "Cover"
+        else:
+            pics, desc = getattr(audio_obj, "pictures", None) or [], ""
+        if len(pics) != 1:
+            return False
+        pic = pics[0]
+        return pic.type == 3 and pic.desc == desc and pic.mime == mime and pic.data == image_bytes
     except Exception:
-        pass
+        return False
 
 
 def set_genre_on_audio(path: Path, audio_tmp, genres_list: List[str]) -> None:
@@ -87,62 +121,42 @@ def set_genre_on_audio(path: Path, audio_tmp, genres_list: List[str]) -> None:
     """
     ext = path.suffix.lower()
     genre_value = "; ".join(genres_list) if genres_list else None
-    try:
-        if isinstance(audio_tmp, ID3):
-            if genre_value:
+    if isinstance(audio_tmp, ID3):
+        audio_tmp.delall("TCON")
+        if genre_value:
+            audio_tmp.add(TCON(encoding=3, text=genre_value))
+    elif ext == ".flac":
+        if audio_tmp.tags is None:
+            audio_tmp.tags = {}
+        if genre_value:
+            audio_tmp.tags["genre"] = [genre_value]
+        else:
+            for k in ("genre", "genres"):
+                if k in audio_tmp.tags:
+                    del audio_tmp.tags[k]
+    elif ext == ".wav":
+        if getattr(audio_tmp, "tags", None) is None:
+            audio_tmp.tags = {}
+        keys_to_try = ("IGNR", "IGEN", "GENR", "GENRE")
+        if genre_value:
+            # The first key the tag container accepts wins
+            for k in keys_to_try:
                 try:
-                    audio_tmp.delall("TCON")
-                except Exception:
-                    pass
-                audio_tmp.add(TCON(encoding=3, text=genre_value))
-            else:
-                try:
-                    audio_tmp.delall("TCON")
-                except Exception:
-                    pass
-            return
-        if ext == ".flac":
-            if audio_tmp.tags is None:
-                audio_tmp.tags = {}
-            if genre_value:
-                audio_tmp.tags["genre"] = [genre_value]
-            else:
-                for k in ("genre", "genres"):
-                    if k in audio_tmp.tags:
-                        del audio_tmp.tags[k]
-            return
-        if ext == ".wav":
-            if getattr(audio_tmp, "tags", None) is None:
-                audio_tmp.tags = {}
-            keys_to_try = ["IGNR", "IGEN", "GENR", "GENRE"]
-            if genre_value:
-                for k in keys_to_try:
-                    try:
-                        audio_tmp.tags[k] = [genre_value]
-                        break
-                    except Exception:
-                        continue
-            else:
-                for k in keys_to_try:
-                    try:
-                        if k in audio_tmp.tags:
-                            del audio_tmp.tags[k]
-                    except Exception:
-                        pass
-            return
-        if hasattr(audio_tmp, "tags"):
-            if audio_tmp.tags is None:
-                audio_tmp.tags = {}
-            if genre_value:
-                audio_tmp.tags["genre"] = [genre_value]
-            else:
-                try:
-                    if "genre" in audio_tmp.tags:
-                        del audio_tmp.tags["genre"]
-                except Exception:
-                    pass
-    except Exception:
-        pass
+                    audio_tmp.tags[k] = [genre_value]
+                    break
+                except (KeyError, TypeError, ValueError):
+                    continue
+        else:
+            for k in keys_to_try:
+                if k in audio_tmp.tags:
+                    del audio_tmp.tags[k]
+    elif hasattr(audio_tmp, "tags"):
+        if audio_tmp.tags is None:
+            audio_tmp.tags = {}
+        if genre_value:
+            audio_tmp.tags["genre"] = [genre_value]
+        elif "genre" in audio_tmp.tags:
+            del audio_tmp.tags["genre"]
 
 
 # Helpers to build RIFF LIST/INFO and ID3 bytes
@@ -156,32 +170,51 @@ def _encode_text_for_info(s: str) -> bytes:
     return b
 
 
+# RIFF INFO sub-chunk id -> metadata key
+_INFO_MAPPING = (
+    (b"INAM", "title"),
+    (b"IART", "artist"),
+    (b"IPRD", "album"),
+    (b"ICRD", "date"),
+    (b"ITRK", "track"),
+    (b"TPOS", "disc"),
+    (b"IGNR", "genre"),
+)
+
+
 def build_info_list_chunk(metadata: dict) -> bytes:
     """
     Build a RIFF LIST/INFO chunk from metadata dictionary.
     """
-    subchunks = b""
-    mapping = [
-        ("INAM", "title"),
-        ("IART", "artist"),
-        ("IPRD", "album"),
-        ("ICRD", "date"),
-        ("ITRK", "track"),
-        ("TPOS", "disc"),
-        ("IGNR", "genre"),
-    ]
-    for cid, key in mapping:
+    parts = []
+    for cid, key in _INFO_MAPPING:
         v = metadata.get(key)
         if v:
             data = _encode_text_for_info(str(v))
-            subchunks += cid.encode('ascii') + struct.pack('<I', len(data)) + data
-    if not subchunks:
+            parts.append(cid)
+            parts.append(struct.pack('<I', len(data)))
+            parts.append(data)
+    if not parts:
         return b""
+    subchunks = b"".join(parts)
     size = 4 + len(subchunks)  # "INFO" + subchunks
     chunk = b"LIST" + struct.pack('<I', size) + b"INFO" + subchunks
     return chunk
 
 
+# metadata key -> ID3 text frame written into the WAV 'id3 ' chunk (in frame order)
+_FRAME_TABLE = (
+    ("title", TIT2),
+    ("artist", TPE1),
+    ("album", TALB),
+    ("date", TDRC),
+    ("track", TRCK),
+    ("disc", TPOS),
+    ("genre", TCON),
+    ("isrc", TSRC),
+)
+
+
 def build_id3_bytes_for_wav(image_bytes: Optional[bytes], mime: Optional[str], metadata: dict) -> bytes:
     """
     Build an ID3v2.3 tag in memory including APIC and textual frames:
@@ -193,25 +226,10 @@ def build_id3_bytes_for_wav(image_bytes: Optional[bytes], mime: Optional[str], m
         if image_bytes:
             id3.add(APIC(encoding=3, mime=mime or "image/jpeg", type=3, desc="Cover", data=image_bytes))
         # textual frames in UTF-16
-        if metadata.get("title"):
-            id3.add(TIT2(encoding=1, text=str(metadata["title"])))
-        if metadata.get("artist"):
-            id3.add(TPE1(encoding=1, text=str(metadata["artist"])))
-        if metadata.get("album"):
-            id3.add(TALB(encoding=1, text=str(metadata["album"])))
-        if metadata.get("date"):
-            id3.add(TDRC(encoding=1, text=str(metadata["date"])))
-        if metadata.get("track"):
-            id3.add(TRCK(encoding=1, text=str(metadata["track"])))
-        if metadata.get("disc"):
-            id3.add(TPOS(encoding=1, text=str(metadata["disc"])))
-        if metadata.get("genre"):
-            id3.add(TCON(encoding=1, text=str(metadata["genre"])))
-        if metadata.get("isrc"):
-            try:
-                id3.add(TSRC(encoding=1, text=str(metadata["isrc"])))
-            except Exception:
-                pass
+        for key, frame_cls in _FRAME_TABLE:
+            v = metadata.get(key)
+            if v:
+                id3.add(frame_cls(encoding=1, text=str(v)))
         bio = io.BytesIO()
         id3.save(bio, v2_version=3)
         b = bio.getvalue()
@@ -227,22 +245,26 @@ def find_first_riff_offset(b: bytes) -> int:
     """
     Return the byte offset of the first 'RIFF' occurrence or -1 if not found.
     """
+    # Well-formed WAVs start with RIFF; only search when they don't
+    if b[:4] == b"RIFF":
+        return 0
     return b.find(b"RIFF")
 
 
-def parse_riff_chunks_and_find_data_offset(b: bytes, start_offset: int = 0):
+def parse_riff_chunks_and_find_data_offset(b: bytes, start_offset: int = 0, validated: bool = False):
     """
     Parse RIFF chunks and find the 'data' chunk offset and size.
+    validated: start_offset is already known to hold 'RIFF' (e.g. from find_first_riff_offset).
     """
     if len(b) < start_offset + 12:
         return -1, None, start_offset + 4
-    if b[start_offset:start_offset+4] != b"RIFF":
+    if not validated and b[start_offset:start_offset+4] != b"RIFF":
         return -1, None, start_offset + 4
     off = start_offset + 12
     end = len(b)
     while off + 8 <= end:
-        cid = b[off:off+4]
-        sz = struct.unpack_from('<I', b, off+4)[0]
+        # id and size of each chunk header are decoded by one C-level unpack
+        cid, sz = struct.unpack_from('<4sI', b, off)
         if cid == b"data":
             return off, sz, start_offset + 4
         advance = 8 + sz + (sz % 2)
@@ -250,29 +272,39 @@ def parse_riff_chunks_and_find_data_offset(b: bytes, start_offset: int = 0):
     return -1, None, start_offset + 4
 
 
-def insert_chunk_before_data(original_bytes: bytes, chunk_id: bytes, chunk_data: bytes) -> bytes:
+def insert_chunks_before_data(original_bytes: bytes, chunks: Iterable[Tuple[bytes, bytes]]) -> bytes:
     """
-    Insert a RIFF chunk (chunk_id) with chunk_data before the 'data' chunk.
+    Insert several RIFF chunks, given as (chunk_id, chunk_data) pairs in order, before
+    the 'data' chunk in one pass. Odd-length chunk data gets a trailing pad byte.
     """
     riff_off = find_first_riff_offset(original_bytes)
     if riff_off == -1:
         raise RuntimeError("RIFF header not found in file")
-    data_off, data_sz, riff_size_field = parse_riff_chunks_and_find_data_offset(original_bytes, riff_off)
-    add_len = 8 + len(chunk_data)
+    data_off, data_sz, riff_size_field = parse_riff_chunks_and_find_data_offset(original_bytes, riff_off, validated=True)
+    new_parts = []
+    for chunk_id, chunk_data in chunks:
+        new_parts.append(chunk_id + struct.pack('<I', len(chunk_data)))
+        new_parts.append(chunk_data)
+        if len(chunk_data) & 1:
+            new_parts.append(b"\x00")
+    add_len = sum(len(p) for p in new_parts)
     orig_riff_size = struct.unpack_from('<I', original_bytes, riff_off+4)[0]
     new_riff_size = orig_riff_size + add_len
-    new_bytes = bytearray(original_bytes)
-    struct.pack_into('<I', new_bytes, riff_off+4, new_riff_size)
-    chunk = bytearray()
-    chunk += chunk_id
-    chunk += struct.pack('<I', len(chunk_data))
-    chunk += chunk_data
+    # Assemble from memoryview slices so the original bytes are copied once, by join
+    mv = memoryview(original_bytes)
     if data_off == -1:
-        new_bytes.extend(chunk)
-        return bytes(new_bytes)
+        parts = (mv[:riff_off+4], struct.pack('<I', new_riff_size), mv[riff_off+8:], *new_parts)
     else:
-        new = new_bytes[:data_off] + chunk + new_bytes[data_off:]
-        return bytes(new)
+        parts = (mv[:riff_off+4], struct.pack('<I', new_riff_size), mv[riff_off+8:data_off],
+                 *new_parts, mv[data_off:])
+    return b"".join(parts)
+
+
+def insert_chunk_before_data(original_bytes: bytes, chunk_id: bytes, chunk_data: bytes) -> bytes:
+    """
+    Insert a RIFF chunk (chunk_id) with chunk_data before the 'data' chunk.
+    """
+    return insert_chunks_before_data(original_bytes, ((chunk_id, chunk_data),))
 
 
 def strip_id3_and_list_info(orig_bytes: bytes) -> bytes:
@@ -286,35 +318,29 @@ def strip_id3_and_list_info(orig_bytes: bytes) -> bytes:
     if len(orig_bytes) < riff_off + 12:
         return orig_bytes
 
+    mv = memoryview(orig_bytes)
     off = riff_off + 12
     end = len(orig_bytes)
-    kept_chunks = bytearray()
+    kept_chunks = []  # memoryview slices, joined once at the end
+    kept_len = 0
     while off + 8 <= end:
-        cid = orig_bytes[off:off+4]
-        sz = struct.unpack_from('<I', orig_bytes, off+4)[0]
+        cid, sz = struct.unpack_from('<4sI', orig_bytes, off)
         data_start = off + 8
         data_end = data_start + sz
         if data_end > end:
             # malformed - keep rest and break
-            kept_chunks += orig_bytes[off:end]
+            kept_chunks.append(mv[off:end])
+            kept_len += end - off
             break
-        skip = False
-        if cid == b"id3 ":
-            skip = True
-        elif cid == b"LIST":
-            # check subtype (first 4 bytes inside LIST data)
-            if orig_bytes[data_start:data_start+4] == b"INFO":
-                skip = True
+        # 'id3 ' chunks and LIST chunks of subtype INFO (first 4 bytes of the data) are dropped
+        skip = cid == b"id3 " or (cid == b"LIST" and orig_bytes[data_start:data_start+4] == b"INFO")
         if not skip:
             # include chunk + padding byte if present
-            chunk_end = data_end + (sz % 2)
-            kept_chunks += orig_bytes[off:chunk_end]
+            chunk = mv[off:data_end + (sz % 2)]
+            kept_chunks.append(chunk)
+            kept_len += len(chunk)
         off = data_end + (sz % 2)
 
-    new_riff_size = 4 + len(kept_chunks)  # 'WAVE' (4) + kept chunks
-    new_buf = bytearray()
-    new_buf += b"RIFF"
-    new_buf += struct.pack('<I', new_riff_size)
-    new_buf += orig_bytes[riff_off+8:riff_off+12]  # 'WAVE' (4 bytes) - keep original WAVE id
-    new_buf += kept_chunks
-    return bytes(new_buf)
+    new_riff_size = 4 + kept_len  # 'WAVE' (4) + kept chunks
+    # 'WAVE' (4 bytes) - keep original WAVE id
+    return b"".join([b"RIFF", struct.pack('<I', new_riff_size), mv[riff_off+8:riff_off+12], *kept_chunks])
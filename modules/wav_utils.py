@@ -5,43 +5,156 @@ via Python's wave module, and apply LIST/INFO and 'id3 ' chunks.
 """
 
 from pathlib import Path
-import tempfile
+import io
+import mmap
+import os
 import wave
 import logging
 import struct
-from typing import Optional
+from typing import List, Optional, Tuple, Union
+
+from modules.tag_utils import (
+    build_info_list_chunk,
+    build_id3_bytes_for_wav,
+    download_image_bytes,
+    find_first_riff_offset,
+)
+
+# Per-file INFO messages are only built when INFO is enabled (worker processes usually run at WARNING)
+_log = logging.getLogger(__name__)
+
+# Precompiled RIFF layouts: chunk header (id + size), u32, PCM fmt body and canonical PCM header
+_CHUNK_HDR = struct.Struct('<4sI')
+_U32 = struct.Struct('<I')
+_PCM_FMT = struct.Struct('<HHIIHH')
+_PCM_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+# Chunks dropped unconditionally, and the LIST subtype that is dropped with them
+_SKIP_IDS = frozenset((b"id3 ",))
+_LIST_SUBTYPE = b"INFO"
 
-from modules.tag_utils import build_info_list_chunk, build_id3_bytes_for_wav, strip_id3_and_list_info, insert_chunk_before_data, download_image_bytes
 
 # Parse ID3v2 header (syncsafe size). Returns full header size (including 10-byte header and optional footer)
-def parse_id3v2_header_size(head_bytes: bytes) -> int:
+# Only the first 10 bytes are read, so callers pass a 10-byte view rather than a copied head
+def parse_id3v2_header_size(head_bytes: Union[bytes, memoryview]) -> int:
     if len(head_bytes) < 10 or head_bytes[:3] != b"ID3":
         return 0
-    sz_bytes = head_bytes[6:10]
-    size = (sz_bytes[0] & 0x7F) << 21 | (sz_bytes[1] & 0x7F) << 14 | (sz_bytes[2] & 0x7F) << 7 | (sz_bytes[3] & 0x7F)
+    # Syncsafe: 4 x 7 bits; one int conversion, then the 7-bit groups are packed together
+    v = int.from_bytes(head_bytes[6:10], "big") & 0x7F7F7F7F
+    size = (v & 0x7F) | ((v >> 1) & 0x3F80) | ((v >> 2) & 0x1FC000) | ((v >> 3) & 0xFE00000)
     flags = head_bytes[5]
     footer = 10 if (flags & 0x10) else 0
     return 10 + size + footer
 
 
-def get_candidate_bytes_from_wav(orig_bytes: bytes) -> bytes:
+def is_clean_riff(b: bytes) -> bool:
+    """
+    True if b is a well-formed RIFF/WAVE buffer: correct RIFF size, a chunk chain
+    that ends exactly at the end of the buffer, and both 'fmt ' and 'data' present.
+    Such buffers need no wave-module rebuild.
+    """
+    end = len(b)
+    if end < 12 or b[:4] != b"RIFF" or b[8:12] != b"WAVE":
+        return False
+    if _U32.unpack_from(b, 4)[0] != end - 8:
+        return False
+    off = 12
+    has_fmt = has_data = False
+    while off + 8 <= end:
+        cid, sz = _CHUNK_HDR.unpack_from(b, off)
+        off += 8 + sz + (sz % 2)
+        if off > end:
+            return False
+        if cid == b"fmt ":
+            has_fmt = True
+        elif cid == b"data":
+            has_data = True
+    return off == end and has_fmt and has_data
+
+
+def get_candidate_range_from_wav(orig_bytes) -> Tuple[int, int]:
     """
-    Determine the appropriate slice of the original WAV bytes to use for rebuilding:
+    Determine the (offset, length) of the original WAV bytes to use for rebuilding:
     - If ID3v2 at start: skip the ID3v2 header chunk
-    - Else if RIFF occurs at offset > 0: slice from RIFF
+    - Else if RIFF occurs at offset > 0: start from RIFF
     - Else use entire file
+    orig_bytes may be any sliceable buffer (bytes, mmap); nothing past the head is copied.
     """
-    head = orig_bytes[:65536]
-    id3_head_size = parse_id3v2_header_size(head)
+    total = len(orig_bytes)
+    # Well-formed WAVs start with RIFF: nothing to skip or search for
+    if orig_bytes[:4] == b"RIFF":
+        return 0, total
+    # The ID3 header size says exactly where the candidate starts, so the head is
+    # only viewed (not copied) and the RIFF scan runs on the original buffer
+    id3_head_size = parse_id3v2_header_size(memoryview(orig_bytes)[:10])
     if id3_head_size > 0:
-        logging.info("WAV: detected ID3v2 header at start (size=%d). Using slice after header.", id3_head_size)
-        return orig_bytes[id3_head_size:]
-    riff_idx = head.find(b"RIFF")
+        if _log.isEnabledFor(logging.INFO):
+            _log.info("WAV: detected ID3v2 header at start (size=%d). Using slice after header.", id3_head_size)
+        off = min(id3_head_size, total)
+        return off, total - off
+    riff_idx = orig_bytes.find(b"RIFF", 0, 65536)
     if riff_idx > 0:
-        logging.info("WAV: RIFF found at offset %d in header; using slice.", riff_idx)
-        return orig_bytes[riff_idx:]
-    logging.info("WAV: no ID3 at start and no RIFF in first 64KB; using entire file as candidate.")
-    return orig_bytes
+        if _log.isEnabledFor(logging.INFO):
+            _log.info("WAV: RIFF found at offset %d in header; using slice.", riff_idx)
+        return riff_idx, total - riff_idx
+    if _log.isEnabledFor(logging.INFO):
+        _log.info("WAV: no ID3 at start and no RIFF in first 64KB; using entire file as candidate.")
+    return 0, total
+
+
+def get_candidate_bytes_from_wav(orig_bytes: bytes) -> bytes:
+    """
+    Bytes form of get_candidate_range_from_wav: the slice of orig_bytes to rebuild from.
+    """
+    off, length = get_candidate_range_from_wav(orig_bytes)
+    if off == 0:
+        return orig_bytes
+    return orig_bytes[off:off + length]
+
+
+def _rewrite_pcm_header(candidate_bytes) -> Optional[bytes]:
+    """
+    Produce what the wave-module rebuild would for a plain PCM candidate: a canonical
+    44-byte header followed by the whole frames of the 'data' chunk, copied once.
+    Returns None when the layout is anything but straightforward; the caller then
+    falls back to the wave module.
+    """
+    end = len(candidate_bytes)
+    if end < 12 or candidate_bytes[:4] != b"RIFF" or candidate_bytes[8:12] != b"WAVE":
+        return None
+    # Sub-chunks are read within the RIFF chunk as far as the buffer allows
+    limit = min(end, 8 + _U32.unpack_from(candidate_bytes, 4)[0])
+    fmt = None
+    off = 12
+    while off + 8 <= limit:
+        cid, sz = _CHUNK_HDR.unpack_from(candidate_bytes, off)
+        if cid == b"data":
+            if fmt is None:
+                return None
+            nchannels, framerate, sampwidth = fmt
+            framesize = nchannels * sampwidth
+            data_start = off + 8
+            data_len = min(sz - sz % framesize, limit - data_start)
+            header = _PCM_HEADER.pack(b"RIFF", 36 + data_len, b"WAVE", b"fmt ", 16,
+                                      1, nchannels, framerate, nchannels * framerate * sampwidth,
+                                      framesize, sampwidth * 8, b"data", data_len)
+            return b"".join((header, memoryview(candidate_bytes)[data_start:data_start + data_len]))
+        next_off = off + 8 + sz + (sz % 2)
+        if next_off > limit:
+            return None
+        if cid == b"fmt ":
+            if sz < 16:
+                return None
+            tag, nchannels, framerate, _, _, bits = _PCM_FMT.unpack_from(candidate_bytes, off + 8)
+            sampwidth = (bits + 7) // 8
+            # Plain PCM with parameters the wave writer accepts as-is
+            if tag != 1 or not nchannels or not framerate or not 1 <= sampwidth <= 4:
+                return None
+            if nchannels * framerate * sampwidth > 0xFFFFFFFF or nchannels * sampwidth > 0xFFFF:
+                return None
+            fmt = (nchannels, framerate, sampwidth)
+        off = next_off
+    return None
 
 
 def rebuild_clean_wav(candidate_bytes: bytes) -> Optional[bytes]:
@@ -49,105 +162,234 @@ def rebuild_clean_wav(candidate_bytes: bytes) -> Optional[bytes]:
     Rebuild a clean WAV using wave module to ensure proper chunk layout.
     Returns bytes of clean WAV or None on failure.
     """
-    tmp_in_name = None
-    tmp_out_name = None
+    # PCM frames are already laid out correctly: only the header needs rewriting
+    try:
+        clean_bytes = _rewrite_pcm_header(candidate_bytes)
+    except struct.error:
+        clean_bytes = None
+    if clean_bytes is not None:
+        return clean_bytes
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_in:
-            tmp_in_name = tmp_in.name
-            tmp_in.write(candidate_bytes)
-        with wave.open(tmp_in_name, 'rb') as r:
+        # wave reads and writes file-like objects, so the rebuild stays in memory
+        with wave.open(io.BytesIO(candidate_bytes), 'rb') as r:
             params = r.getparams()
             frames = r.readframes(r.getnframes())
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_out:
-            tmp_out_name = tmp_out.name
-        with wave.open(tmp_out_name, 'wb') as w:
+        bio_out = io.BytesIO()
+        with wave.open(bio_out, 'wb') as w:
             w.setparams(params)
             w.writeframes(frames)
-        clean_bytes = Path(tmp_out_name).read_bytes()
-        return clean_bytes
+        return bio_out.getvalue()
     except Exception as e:
-        logging.error("WAV rebuild failed: %s", e)
+        _log.error("WAV rebuild failed: %s", e)
         return None
-    finally:
-        # cleanup temp intermediate files if present
-        try:
-            if tmp_in_name:
-                Path(tmp_in_name).unlink(missing_ok=True)
-        except Exception:
-            pass
-        try:
-            if tmp_out_name:
-                # keep tmp_out until caller reads/writes; caller should unlink
-                pass
-        except Exception:
-            pass
+
+
+def _wav_parts_with_metadata(clean_bytes, list_chunk: bytes, id3_bytes: bytes) -> list:
+    """
+    Strip and insert in one walk over the chunks: existing id3/LIST INFO chunks are
+    dropped to avoid duplicates, list_chunk and an 'id3 ' chunk holding id3_bytes go
+    right before 'data' (or last if there is none), and the RIFF size is recomputed.
+    Returns the output as a list of bytes / memoryview slices of clean_bytes.
+    Raises RuntimeError if clean_bytes holds no RIFF header.
+    """
+    riff_off = find_first_riff_offset(clean_bytes)
+    if riff_off == -1 or len(clean_bytes) < riff_off + 12:
+        raise RuntimeError("RIFF header not found in file")
+    # Chunks must end on even offsets: an odd-length chunk gets its pad byte as a
+    # separate part (the size field keeps the unpadded length), never a concatenation
+    new_chunks = []
+    if list_chunk:
+        new_chunks.append(list_chunk)
+        if len(list_chunk) & 1:
+            new_chunks.append(b"\x00")
+    if id3_bytes:
+        new_chunks.append(_CHUNK_HDR.pack(b"id3 ", len(id3_bytes)))
+        new_chunks.append(id3_bytes)
+        if len(id3_bytes) & 1:
+            new_chunks.append(b"\x00")
+
+    mv = memoryview(clean_bytes)
+    parts = [b"RIFF", b"", mv[riff_off+8:riff_off+12]]  # RIFF size filled in below
+    off = riff_off + 12
+    end = len(clean_bytes)
+    while off + 8 <= end:
+        cid, sz = _CHUNK_HDR.unpack_from(clean_bytes, off)
+        if cid == b"data" and new_chunks:
+            parts.extend(new_chunks)
+            new_chunks = []
+        data_start = off + 8
+        data_end = data_start + sz
+        if data_end > end:
+            # malformed - keep rest and break
+            parts.append(mv[off:end])
+            break
+        if not (cid in _SKIP_IDS or (cid == b"LIST" and clean_bytes[data_start:data_start+4] == _LIST_SUBTYPE)):
+            # include chunk + padding byte if present
+            parts.append(mv[off:data_end + (sz % 2)])
+        off = data_end + (sz % 2)
+    parts.extend(new_chunks)
+    parts[1] = _U32.pack(sum(len(p) for p in parts[2:]))  # 'WAVE' + chunks
+    return parts
+
+
+def rebuild_wav_with_metadata(clean_bytes: bytes, list_chunk: bytes, id3_bytes: bytes) -> bytes:
+    """
+    In-memory form of the metadata rewrite: the parts from _wav_parts_with_metadata
+    joined once. Raises RuntimeError if clean_bytes holds no RIFF header.
+    """
+    return b"".join(_wav_parts_with_metadata(clean_bytes, list_chunk, id3_bytes))
 
 
 def apply_metadata_chunks_to_wav(clean_bytes: bytes, list_chunk: bytes, id3_bytes: bytes) -> Optional[bytes]:
     """
     Insert LIST/INFO and 'id3 ' chunks before 'data' chunk.
+    clean_bytes: bytes or a memoryview of a well-formed RIFF/WAVE buffer.
     list_chunk: full LIST chunk bytes (including 'LIST' + size + 'INFO' + subchunks) or b''.
-    id3_bytes: bytes for id3 (already padded to even length) or b''.
+    id3_bytes: bytes for id3 or b''; odd lengths are padded on insertion.
     Returns modified bytes or None on failure.
     """
-    try:
-        # strip existing id3/LIST INFO to avoid duplicates first
-        try:
-            clean_bytes = strip_id3_and_list_info(clean_bytes)
-        except Exception as e:
-            logging.info("WAV: failed to strip existing id3/LIST chunks (non-fatal): %s", e)
+    parts = _metadata_parts_or_none(clean_bytes, list_chunk, id3_bytes)
+    return b"".join(parts) if parts is not None else None
 
-        if list_chunk:
-            # pass only the "INFO"+subchunks as chunk_data to insert_chunk_before_data
-            clean_bytes = insert_chunk_before_data(clean_bytes, b"LIST", list_chunk[8:])  # list_chunk[0:8] is 'LIST'+size
-            logging.info("WAV: LIST/INFO chunk inserted.")
-        if id3_bytes:
-            clean_bytes = insert_chunk_before_data(clean_bytes, b"id3 ", id3_bytes)
-            logging.info("WAV: 'id3 ' chunk (ID3v2.3 with APIC + textual frames) inserted.")
-        return clean_bytes
+
+def _metadata_parts_or_none(clean_bytes, list_chunk: bytes, id3_bytes: bytes) -> Optional[list]:
+    try:
+        parts = _wav_parts_with_metadata(clean_bytes, list_chunk, id3_bytes)
     except Exception as e:
-        logging.error("WAV: failed to insert metadata chunks: %s", e)
+        _log.error("WAV: failed to insert metadata chunks: %s", e)
         return None
+    if _log.isEnabledFor(logging.INFO):
+        if list_chunk:
+            _log.info("WAV: LIST/INFO chunk inserted.")
+        if id3_bytes:
+            _log.info("WAV: 'id3 ' chunk (ID3v2.3 with APIC + textual frames) inserted.")
+    return parts
+
+
+def _rewrite_wav(temp_path: Path, build_chunks) -> bool:
+    """
+    Shared WAV write path: map temp_path, take the candidate range, rebuild it only
+    if it is not already well-formed, then replace the id3/LIST INFO chunks with the
+    (list_chunk, id3_bytes) pair returned by build_chunks(clean_bytes) and write the
+    result back to temp_path.
+    """
+    # The original is mapped rather than read, so only the pages actually touched (the
+    # header probe, the chunk headers, the spliced ranges) are loaded; the file is read
+    # into memory only where mapping is not possible
+    try:
+        with open(temp_path, "rb") as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                buf = f.read()
+    except OSError as e:
+        _log.error("WAV: could not read temp file bytes: %s", e)
+        return False
+
+    # The output goes to a sibling file part by part, straight from the mapped
+    # chunks, so the rewritten WAV is never assembled in memory
+    part_path = Path(temp_path).with_name(Path(temp_path).name + ".part")
+    written = False
+    try:
+        off, length = get_candidate_range_from_wav(buf)
+        candidate = memoryview(buf)[off:off + length]
+        try:
+            # Only malformed files go through the frame-by-frame rebuild
+            if is_clean_riff(candidate):
+                clean_bytes = candidate
+            else:
+                clean_bytes = rebuild_clean_wav(candidate)
+            if clean_bytes is not None:
+                list_chunk, id3_bytes = build_chunks(clean_bytes)
+                parts = _metadata_parts_or_none(clean_bytes, list_chunk, id3_bytes)
+                if parts is not None:
+                    try:
+                        with open(part_path, "wb") as f:
+                            f.writelines(parts)
+                        written = True
+                    except Exception as e:
+                        _log.error("Failed writing final WAV bytes to temp file: %s", e)
+                    finally:
+                        parts = None
+        finally:
+            clean_bytes = None
+            candidate.release()
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
 
+    # Any map is closed, so temp_path can be replaced
+    try:
+        if written:
+            os.replace(part_path, temp_path)
+            return True
+    except OSError as e:
+        _log.error("Failed writing final WAV bytes to temp file: %s", e)
+    try:
+        os.unlink(part_path)
+    except OSError:
+        pass
+    return False
 
-def finalize_wav_with_metadata(temp_path: Path, image_url: Optional[str], metadata_map: dict) -> bool:
+
+def finalize_wav_with_metadata(temp_path: Path, image_url: Optional[str], metadata_map: dict,
+                               image: Optional[Tuple[bytes, str]] = None) -> bool:
     """
     High-level helper used by processor.process_single_file:
-    - read bytes from temp_path
-    - determine candidate bytes and rebuild a clean WAV
+    - memory-map temp_path and determine the candidate range
+    - rebuild a clean WAV only if the candidate is not already well-formed
     - build LIST chunk and ID3 bytes using tag_utils builders
     - insert chunks and write back to temp_path
+    image: already downloaded (bytes, mime); when given, image_url is not fetched.
     """
-    try:
-        orig_bytes = Path(temp_path).read_bytes()
-    except Exception as e:
-        logging.error("WAV: could not read temp file bytes: %s", e)
-        return False
+    def build_chunks(clean_bytes):
+        got = image
+        if got is None and image_url:
+            got = download_image_bytes(image_url)
+        image_bytes, image_mime = got if got else (None, None)
+        return build_info_list_chunk(metadata_map), build_id3_bytes_for_wav(image_bytes, image_mime, metadata_map)
 
-    candidate_bytes = get_candidate_bytes_from_wav(orig_bytes)
-    clean_bytes = rebuild_clean_wav(candidate_bytes)
-    if clean_bytes is None:
-        return False
+    return _rewrite_wav(temp_path, build_chunks)
 
-    # build list chunk and id3 bytes
-    list_chunk = build_info_list_chunk(metadata_map)
-    image_bytes = None
-    image_mime = None
-    if image_url:
-        got = download_image_bytes(image_url)
-        if got:
-            image_bytes, image_mime = got
-    id3_bytes = build_id3_bytes_for_wav(image_bytes, image_mime, metadata_map)
-
-    # Insert chunks
-    final_bytes = apply_metadata_chunks_to_wav(clean_bytes, list_chunk, id3_bytes)
-    if final_bytes is None:
-        return False
 
-    try:
-        Path(temp_path).write_bytes(final_bytes)
-    except Exception as e:
-        logging.error("Failed writing final WAV bytes to temp file: %s", e)
-        return False
+def _existing_info_items(clean_bytes) -> List[Tuple[bytes, bytes]]:
+    """
+    Return the LIST/INFO sub-chunks of a RIFF/WAVE buffer as (id, data) pairs.
+    """
+    items: List[Tuple[bytes, bytes]] = []
+    off = 12
+    end = len(clean_bytes)
+    while off + 8 <= end:
+        cid, sz = _CHUNK_HDR.unpack_from(clean_bytes, off)
+        data_start = off + 8
+        data_end = min(data_start + sz, end)
+        if cid == b"LIST" and clean_bytes[data_start:data_start+4] == _LIST_SUBTYPE:
+            sub = data_start + 4
+            while sub + 8 <= data_end:
+                sid, ssz = _CHUNK_HDR.unpack_from(clean_bytes, sub)
+                items.append((sid, bytes(clean_bytes[sub+8:min(sub + 8 + ssz, data_end)])))
+                sub += 8 + ssz + (ssz % 2)
+        off = data_start + sz + (sz % 2)
+    return items
+
+
+def update_wav_genre(temp_path: Path, genre_value: str, id3_bytes: bytes) -> bool:
+    """
+    Genre-only write for WAV: existing LIST/INFO entries are kept and only IGNR is
+    replaced; id3_bytes is the file's existing ID3 tag with the new TCON already set.
+    """
+    def build_chunks(clean_bytes):
+        parts = []
+        for sid, data in _existing_info_items(clean_bytes):
+            if sid != b"IGNR":
+                parts.append(_CHUNK_HDR.pack(sid, len(data)))
+                parts.append(data)
+                if len(data) & 1:
+                    parts.append(b"\x00")
+        # IGNR itself comes from the regular LIST builder
+        parts.append(build_info_list_chunk({"genre": genre_value})[12:])
+        subchunks = b"".join(parts)
+        list_chunk = _CHUNK_HDR.pack(b"LIST", 4 + len(subchunks)) + _LIST_SUBTYPE + subchunks
+        return list_chunk, id3_bytes
 
-    return True
+    return _rewrite_wav(temp_path, build_chunks)
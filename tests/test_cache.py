@@ -0,0 +1,95 @@
+"""
+tests/test_cache.py
+Round-trip, TTL and key behaviour of the persistent Spotify cache.
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules import cache
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self._tmp.name) / "cache.sqlite3"
+        patches = (
+            mock.patch.object(cache, "CACHE_PATH", self.db_path),
+            mock.patch.object(cache, "_conn", None),
+            mock.patch.object(cache, "_disabled", False),
+        )
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        cache.clear_memo()
+        self.addCleanup(cache.clear_memo)
+
+    def tearDown(self):
+        if cache._conn is not None:
+            cache._conn.close()
+        self._tmp.cleanup()
+
+    def _reopen(self):
+        # Fresh connection and empty memo: reads have to come from disk
+        cache._conn.close()
+        cache._conn = None
+        cache.clear_memo()
+
+    def test_round_trip(self):
+        track = {"id": "t1", "name": "Song", "artists": [{"id": "a1", "name": "Artist"}]}
+        cache.put_isrc_track("usabc1234567", track)
+        cache.put_query_match("k1", track)
+        cache.put_artist_genres("a1", ("rock", "pop"))
+        self._reopen()
+        self.assertEqual(cache.get_isrc_track(" USABC1234567 "), track)
+        self.assertEqual(cache.get_query_match("k1"), track)
+        self.assertEqual(cache.get_artist_genres("a1"), ["rock", "pop"])
+
+    def test_empty_genres_are_cached(self):
+        cache.put_artist_genres("a2", [])
+        self._reopen()
+        self.assertEqual(cache.get_artist_genres("a2"), [])
+
+    def test_missing_key(self):
+        self.assertIsNone(cache.get_isrc_track("NOPE"))
+        self.assertIsNone(cache.get_artist_genres("nope"))
+
+    def test_expired_entries_are_ignored(self):
+        cache.put_artist_genres("old", ["rock"])
+        cache.put_artist_genres("new", ["pop"])
+        cache._conn.execute("UPDATE artist_to_genres SET fetched_at = ? WHERE key = 'old'",
+                            (time.time() - (cache.CACHE_TTL_DAYS + 1) * 86400,))
+        cache._conn.commit()
+        self._reopen()
+        self.assertIsNone(cache.get_artist_genres("old"))
+        self.assertEqual(cache.get_artist_genres("new"), ["pop"])
+
+    def test_memo_serves_without_disk(self):
+        cache.put_query_match("k2", {"id": "x"})
+        cache._conn.execute("DELETE FROM query_to_match")
+        cache._conn.commit()
+        self.assertEqual(cache.get_query_match("k2"), {"id": "x"})
+
+    def test_unusable_path_disables_cache(self):
+        with mock.patch.object(cache, "CACHE_PATH", Path(self._tmp.name) / "missing" / "cache.sqlite3"):
+            cache.put_artist_genres("a3", ["rock"])
+            self.assertTrue(cache._disabled)
+            # The in-process layer still serves this run
+            self.assertEqual(cache.get_artist_genres("a3"), ["rock"])
+
+    def test_query_key(self):
+        key = cache.query_key("artist", "title", None)
+        self.assertEqual(key, cache.query_key("artist", "title", ""))
+        self.assertNotEqual(key, cache.query_key("artist", "title", "album"))
+        self.assertNotEqual(key, cache.query_key("artisttitle", "", None))
+        with mock.patch.object(cache, "MARKET", "XX"):
+            self.assertNotEqual(key, cache.query_key("artist", "title", None))
+        with mock.patch.object(cache, "SEARCH_CANDIDATE_LIMIT", cache.SEARCH_CANDIDATE_LIMIT + 1):
+            self.assertNotEqual(key, cache.query_key("artist", "title", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
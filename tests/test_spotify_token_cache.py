@@ -0,0 +1,71 @@
+"""
+tests/test_spotify_token_cache.py
+Reuse and refresh of the on-disk Spotify token cache (no network: get_spotify_token is mocked).
+"""
+
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules import spotify_client
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.cache_path = Path(self._tmp.name) / "token.json"
+        memo = mock.patch.dict(spotify_client._TOKEN_MEMO, clear=True)
+        memo.start()
+        self.addCleanup(memo.stop)
+        fetch = mock.patch.object(spotify_client, "get_spotify_token", side_effect=self._fake_token)
+        self.fetch = fetch.start()
+        self.addCleanup(fetch.stop)
+        self.issued = 0
+
+    def _fake_token(self, client_id, client_secret):
+        self.issued += 1
+        return f"token-{self.issued}", int(time.time()) + 3600
+
+    def _get(self, client_id="cid"):
+        return spotify_client.get_spotify_token_cached(client_id, "secret", cache_path=self.cache_path)
+
+    def test_token_written_and_reused_across_runs(self):
+        token, expires_at = self._get()
+        self.assertEqual(token, "token-1")
+        data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        self.assertEqual(data, {"client_id": "cid", "access_token": "token-1", "expires_at": expires_at})
+        # A new run starts with an empty memo and reads the file
+        spotify_client._TOKEN_MEMO.clear()
+        self.assertEqual(self._get(), ("token-1", expires_at))
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertFalse(Path(f"{self.cache_path}.tmp").exists())
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_file_is_owner_only(self):
+        self._get()
+        self.assertEqual(stat.S_IMODE(self.cache_path.stat().st_mode) & 0o077, 0)
+
+    def test_expiring_token_is_refreshed(self):
+        self.cache_path.write_text(json.dumps({"client_id": "cid", "access_token": "stale",
+                                               "expires_at": int(time.time()) + 30}), encoding="utf-8")
+        self.assertEqual(self._get()[0], "token-1")
+
+    def test_other_client_id_is_not_reused(self):
+        self._get("cid")
+        spotify_client._TOKEN_MEMO.clear()
+        self.assertEqual(self._get("other")[0], "token-2")
+
+    def test_corrupt_file_is_replaced(self):
+        self.cache_path.write_text("{not json", encoding="utf-8")
+        self.assertEqual(self._get()[0], "token-1")
+        self.assertEqual(json.loads(self.cache_path.read_text(encoding="utf-8"))["access_token"], "token-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
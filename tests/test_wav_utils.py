@@ -0,0 +1,176 @@
+"""
+tests/test_wav_utils.py
+RIFF validation, the one-walk metadata rewrite and the file-level WAV finalize.
+"""
+
+import io
+import struct
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+
+from mutagen.id3 import ID3, TIT2
+from mutagen.wave import WAVE
+
+from modules import wav_utils
+from modules.tag_utils import build_info_list_chunk, build_id3_bytes_for_wav
+
+
+def make_wav(nframes: int = 100, sampwidth: int = 2, nchannels: int = 1) -> bytes:
+    bio = io.BytesIO()
+    with wave.open(bio, "wb") as w:
+        w.setnchannels(nchannels)
+        w.setsampwidth(sampwidth)
+        w.setframerate(8000)
+        w.writeframes(bytes(range(256)) * (nframes * sampwidth * nchannels // 256 + 1))
+    return bio.getvalue()
+
+
+def add_chunk_before_data(b: bytes, cid: bytes, data: bytes) -> bytes:
+    chunk = cid + struct.pack("<I", len(data)) + data + (b"\x00" if len(data) & 1 else b"")
+    i = b.index(b"data")
+    out = b[:i] + chunk + b[i:]
+    return out[:4] + struct.pack("<I", len(out) - 8) + out[8:]
+
+
+def chunk_ids(b: bytes) -> list:
+    ids = []
+    off = 12
+    while off + 8 <= len(b):
+        cid, sz = struct.unpack_from("<4sI", b, off)
+        if cid == b"LIST":
+            cid += b"/" + b[off + 8:off + 12]
+        ids.append(cid)
+        off += 8 + sz + (sz % 2)
+    return ids
+
+
+def read_frames(b: bytes) -> bytes:
+    with wave.open(io.BytesIO(b), "rb") as r:
+        return r.readframes(r.getnframes())
+
+
+class IsCleanRiffTest(unittest.TestCase):
+    def test_plain_wav_is_clean(self):
+        self.assertTrue(wav_utils.is_clean_riff(make_wav()))
+
+    def test_extra_chunks_are_clean(self):
+        b = add_chunk_before_data(make_wav(), b"JUNK", b"abc")
+        self.assertTrue(wav_utils.is_clean_riff(b))
+
+    def test_wrong_riff_size(self):
+        b = make_wav()
+        self.assertFalse(wav_utils.is_clean_riff(b[:4] + struct.pack("<I", len(b)) + b[8:]))
+
+    def test_truncated(self):
+        b = make_wav()
+        self.assertFalse(wav_utils.is_clean_riff(b[:-1]))
+        self.assertFalse(wav_utils.is_clean_riff(b[:8]))
+
+    def test_trailing_bytes(self):
+        self.assertFalse(wav_utils.is_clean_riff(make_wav() + b"\x00\x00"))
+
+    def test_missing_data_chunk(self):
+        b = make_wav()
+        i = b.index(b"data")
+        head = b[:i]
+        self.assertFalse(wav_utils.is_clean_riff(head[:4] + struct.pack("<I", len(head) - 8) + head[8:]))
+
+    def test_not_wave(self):
+        b = make_wav()
+        self.assertFalse(wav_utils.is_clean_riff(b[:8] + b"AVI " + b[12:]))
+
+
+class RebuildWavWithMetadataTest(unittest.TestCase):
+    def test_chunks_inserted_before_data(self):
+        src = make_wav()
+        list_chunk = build_info_list_chunk({"title": "Song", "artist": "Artist"})
+        id3_bytes = build_id3_bytes_for_wav(None, None, {"title": "Song"})
+        out = wav_utils.rebuild_wav_with_metadata(src, list_chunk, id3_bytes)
+        self.assertEqual(chunk_ids(out), [b"fmt ", b"LIST/INFO", b"id3 ", b"data"])
+        self.assertTrue(wav_utils.is_clean_riff(out))
+        self.assertEqual(read_frames(out), read_frames(src))
+
+    def test_existing_metadata_replaced(self):
+        src = make_wav()
+        src = add_chunk_before_data(src, b"LIST", build_info_list_chunk({"title": "Old"})[8:])
+        src = add_chunk_before_data(src, b"id3 ", b"old tag")
+        src = add_chunk_before_data(src, b"LIST", b"adtl" + b"keep")
+        src = add_chunk_before_data(src, b"JUNK", b"x")
+        out = wav_utils.rebuild_wav_with_metadata(src, build_info_list_chunk({"title": "New"}), b"new tag!")
+        self.assertEqual(chunk_ids(out), [b"fmt ", b"LIST/adtl", b"JUNK", b"LIST/INFO", b"id3 ", b"data"])
+        self.assertNotIn(b"Old", out)
+        self.assertNotIn(b"old tag", out)
+        self.assertIn(b"New", out)
+        self.assertTrue(wav_utils.is_clean_riff(out))
+
+    def test_odd_id3_is_padded(self):
+        out = wav_utils.rebuild_wav_with_metadata(make_wav(), b"", b"abc")
+        i = out.index(b"id3 ")
+        self.assertEqual(struct.unpack_from("<I", out, i + 4)[0], 3)
+        self.assertEqual(out[i + 8:i + 12], b"abc\x00")
+        self.assertTrue(wav_utils.is_clean_riff(out))
+
+    def test_no_metadata_strips_only(self):
+        src = add_chunk_before_data(make_wav(), b"id3 ", b"tag!")
+        out = wav_utils.rebuild_wav_with_metadata(src, b"", b"")
+        self.assertEqual(out, make_wav())
+
+    def test_memoryview_input(self):
+        src = make_wav()
+        list_chunk = build_info_list_chunk({"title": "Song"})
+        self.assertEqual(wav_utils.rebuild_wav_with_metadata(memoryview(src), list_chunk, b"tag!"),
+                         wav_utils.rebuild_wav_with_metadata(src, list_chunk, b"tag!"))
+
+    def test_no_riff_raises(self):
+        with self.assertRaises(RuntimeError):
+            wav_utils.rebuild_wav_with_metadata(b"not a wav file", b"", b"")
+
+
+class FinalizeWavTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "track.wav"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _finalize(self, data: bytes) -> bool:
+        self.path.write_bytes(data)
+        return wav_utils.finalize_wav_with_metadata(self.path, None, {"title": "Song", "genre": "rock"},
+                                                    image=(b"\x89PNG" * 10, "image/png"))
+
+    def assert_tagged(self, src_frames: bytes):
+        out = self.path.read_bytes()
+        self.assertTrue(wav_utils.is_clean_riff(out))
+        self.assertEqual(read_frames(out), src_frames)
+        tags = WAVE(str(self.path)).tags
+        self.assertEqual(tags["TIT2"].text, ["Song"])
+        self.assertEqual(tags["TCON"].text, ["rock"])
+        self.assertEqual(tags.getall("APIC")[0].data, b"\x89PNG" * 10)
+        self.assertEqual(list(self.path.parent.glob("*.part")), [])
+
+    def test_clean_wav(self):
+        src = make_wav()
+        self.assertTrue(self._finalize(src))
+        self.assert_tagged(read_frames(src))
+
+    def test_leading_id3_tag_is_dropped(self):
+        src = make_wav()
+        tag = ID3()
+        tag.add(TIT2(encoding=3, text="Leading"))
+        bio = io.BytesIO()
+        tag.save(bio)
+        self.assertTrue(self._finalize(bio.getvalue() + src))
+        self.assertTrue(self.path.read_bytes().startswith(b"RIFF"))
+        self.assert_tagged(read_frames(src))
+
+    def test_unreadable_input_is_left_alone(self):
+        self.assertFalse(self._finalize(b"junk" * 100))
+        self.assertEqual(self.path.read_bytes(), b"junk" * 100)
+        self.assertEqual(list(self.path.parent.glob("*.part")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()